@@ -0,0 +1,102 @@
+# Benchmark of the incremental API sync backend (--sync) against the local stand-in.
+#
+# Publishes a synthetic world on benchmarks/standin_server.py, then runs three
+# syncs: a cold one that mirrors everything, an unchanged one that should only
+# list, and one after editing and deleting a few articles. Reports wall time
+# and API requests for each.
+#
+#     uv run python benchmarks/api_sync.py --articles 500 --latency 0.02 --edits 10
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from standin_server import StandInServer, add_settings_arguments, settings_from_args  # noqa: E402
+
+from wa_parser import cli, config  # noqa: E402
+
+
+def publish_world(server, articles):
+    for number in range(articles):
+        server.add_entity(
+            "articles",
+            {
+                "id": f"00000000-0000-0000-0000-{number:012d}",
+                "title": f"Synced Article {number}",
+                "templateType": "article",
+                "entityClass": "Article",
+                "content": f"[p]Synced article {number}.[/p]",
+            },
+        )
+    for number in range(max(1, articles // 10)):
+        image = server.add_image(700000 + number, f"Synced Image {number}", api_visible=False)
+        server.add_entity("images", image)
+    server.add_entity("maps", {"id": "map-1", "title": "Synced Realm", "entityClass": "Map"})
+
+
+def count_requests(server):
+    return server.stats.as_dict()["requests"]
+
+
+def run_sync(label, server):
+    requests_before = count_requests(server)
+    sys.argv = ["WA-Parser.py", "--sync"]
+    started = time.perf_counter()
+    try:
+        asyncio.run(cli.main(cli.parse_args()))
+    finally:
+        cli.telemetry.stop_telemetry()
+    elapsed = time.perf_counter() - started
+    return label, elapsed, count_requests(server) - requests_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental World Anvil API sync against a stand-in.")
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=5, help="Articles edited (and deleted) before the last sync.")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as root, StandInServer(settings=settings_from_args(args)) as server:
+        publish_world(server, args.articles)
+        config.source_directory = os.path.join(root, "export")
+        config.destination_directory = os.path.join(root, "vault")
+        config.obsidian_resource_folder = os.path.join(root, "vault-images")
+        config.templates_directory = os.path.join(REPO_ROOT, "templates")
+        config.run_history_file = os.path.join(root, "history.json")
+        config.checkpoint_file = os.path.join(root, "checkpoint.json")
+        config.json_cache_directory = os.path.join(root, "json-cache")
+        config.run_manifest_file = os.path.join(root, "run-manifest.json")
+        config.image_size_history_file = os.path.join(root, "image-sizes.json")
+        config.api_sync_state_file = os.path.join(root, "sync-state.json")
+        config.inline_image_api_fallback_enabled = False
+        config.worldanvil_api_base_url = server.api_base_url
+        config.worldanvil_world_id = server.world_id
+        config.worldanvil_api_key = server.api_token
+        config.worldanvil_api_auth_header = server.auth_header
+
+        results.append(run_sync("cold", server))
+        results.append(run_sync("unchanged", server))
+        for number in range(args.edits):
+            record = server.entities["articles"][f"00000000-0000-0000-0000-{number:012d}"]
+            server.add_entity("articles", dict(record, content="[p]Edited.[/p]"), update_date="2024-02-01 00:00:00")
+        server.remove_entity("articles", f"00000000-0000-0000-0000-{args.articles - 1:012d}")
+        results.append(run_sync("after edits", server))
+        mirrored = sum(len(files) for _, _, files in os.walk(config.source_directory))
+
+    print()
+    print(f"{'sync':<12} {'wall s':>8} {'requests':>9}")
+    for label, elapsed, requests in results:
+        print(f"{label:<12} {elapsed:>8.2f} {requests:>9}")
+    print(f"mirrored entity files: {mirrored}")
+
+
+if __name__ == "__main__":
+    main()
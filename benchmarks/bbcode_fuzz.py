@@ -0,0 +1,177 @@
+# Fuzz and performance regression suite for format_content.
+#
+# 1. Equivalence: random BBCode (valid, nested, unclosed, mixed newlines,
+#    mentions, image and spotify tags) must format exactly as the original
+#    regex-based formatter did. Tag parameters stay under the 1024-character
+#    cap, which is the one intended difference.
+# 2. Scaling: adversarial inputs (thousands of unclosed tags on one line,
+#    unterminated mentions, image and section tags) are formatted at size N and
+#    4N; the time ratio must stay near-linear (well below the 16x of a
+#    quadratic formatter).
+#
+# Exits non-zero on any mismatch or super-linear case.
+#
+#     uv run python benchmarks/bbcode_fuzz.py --cases 2000 --size 20000
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from wa_parser import config  # noqa: E402
+from wa_parser.image_pipeline import replace_inline_image_tag  # noqa: E402
+from wa_parser.text_formatting import format_content, replace_mention, replace_spotify_tag  # noqa: E402
+
+MAX_SCALING_RATIO = 8.0
+
+FUZZ_TOKENS = [
+    "[h1]", "[/h1]", "[h2]", "[/h2]", "[h3]", "[/h3]", "[h4]", "[/h4]", "[p]", "[/p]", "[b]", "[/b]",
+    "[i]", "[/i]", "[u]", "[/u]", "[s]", "[/s]", "[url]", "[/url]", "[list]", "[/list]", "[*]",
+    "[code]", "[/code]", "[quote]", "[/quote]", "[sup]", "[/sup]", "[sub]", "[/sub]", "[ol]", "[/ol]",
+    "[ul]", "[/ul]", "[li]", "[/li]", "[br]", "[section:x]", "[/section]", "[container:y]", "[/container]",
+    "[B]", "[/B]", "[", "]", "/", "\n", "\r\n\r", "  ", "\t", " ", "word", "x", "[b][i]", "[/i][/b]",
+    "@[", "](", ")", "@[Title](article:1)", "[img:1|left]", "[img:", "|", "[img]2[/img]",
+    "[spotify:https://open.spotify.com/track/abc]", "[spotify:https://open.spotify.com/album/x?si=1",
+]
+
+
+def reference_format(text):
+    # The regex chain format_content used before the linear-time rewrite.
+    text = re.sub(r"@\[([^\]]+)\]\([^)]+\)", replace_mention, text)
+    text = re.sub(r"\r\n\r", r"\n", text)
+    text = re.sub(
+        r"\[spotify:(https?://open\.spotify\.com/(track|album|playlist|episode|show)/([A-Za-z0-9]+)(?:\?[^\]]*)?)\]",
+        replace_spotify_tag,
+        text,
+        flags=re.IGNORECASE,
+    )
+    text = re.sub(
+        r"\[img:(\d+)(\|[^\]]*)?\]|\[img\](\d+)\[/img\]",
+        replace_inline_image_tag,
+        text,
+        flags=re.IGNORECASE,
+    )
+    text = re.sub(r"\[section:[^\]]*\]|\[/section\]", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\[container:[^\]]*\]|\[/container\]", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n +(\[h\d\])", r"\n\1", text)
+    text = re.sub(r"\[br\]", r"\n", text)
+    text = re.sub(r"\[h1\](.*?)\[/h1\]", r"# \1", text)
+    text = re.sub(r"\[h2\](.*?)\[/h2\]", r"## \1", text)
+    text = re.sub(r"\[h3\](.*?)\[/h3\]", r"### \1", text)
+    text = re.sub(r"\[h4\](.*?)\[/h4\]", r"#### \1", text)
+    text = re.sub(r"\[p\](.*?)\[/p\]", r"\1\n", text)
+    text = re.sub(r"\[b\](.*?)\[/b\]", r"**\1**", text)
+    text = re.sub(r"\[i\](.*?)\[/i\]", r"*\1*", text)
+    text = re.sub(r"\[u\](.*?)\[/u\]", r"<u>\1</u>", text)
+    text = re.sub(r"\[s\](.*?)\[/s\]", r"~~\1~~", text)
+    text = re.sub(r"\[url\](.*?)\[/url\]", r"[\1]", text)
+    text = re.sub(
+        r"\[list\](.*?)\[/list\]",
+        lambda m: re.sub(r"\[\*\](.*?)\n?", r"* \1\n", m.group(1), flags=re.DOTALL),
+        text,
+        flags=re.DOTALL,
+    )
+    text = re.sub(r"\[code\](.*?)\[/code\]", r"```\n\1\n```", text)
+    text = re.sub(
+        r"\[quote\]([\s\S]*?)\[/quote\]",
+        lambda m: "> " + "\n> ".join(m.group(1).split("\n")),
+        text,
+        flags=re.DOTALL,
+    )
+    text = re.sub(r"\[sup\](.*?)\[/sup\]", r"<sup>\1</sup>", text)
+    text = re.sub(r"\[sub\](.*?)\[/sub\]", r"<sub>\1</sub>", text)
+    text = re.sub(r"\[ol\]|\[/ol\]", r"", text)
+    text = re.sub(r"\[ul\]|\[/ul\]", r"", text)
+    text = re.sub(r"\[li\](.*?)\[/li\]", r"- \1", text)
+    return text
+
+
+def format_bbcode(text):
+    return format_content({"text": text})
+
+
+def check_equivalence(cases, seed):
+    rng = random.Random(seed)
+    failures = 0
+    for case in range(cases):
+        text = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 80)))
+        expected = reference_format(text)
+        actual = format_bbcode(text)
+        if actual != expected:
+            failures += 1
+            if failures <= 5:
+                print(f"mismatch in case {case}: {text!r}")
+                print(f"  expected {expected!r}")
+                print(f"  actual   {actual!r}")
+    print(f"equivalence: {cases - failures}/{cases} cases match the regex formatter")
+    return failures == 0
+
+
+def adversarial_inputs(size):
+    return {
+        "unclosed bold, one line": "[b]x" * size,
+        "unclosed heading, one line": "[h1]" * size,
+        "unclosed list": "[list][*]item\n" * size,
+        "unclosed quote": "[quote]line\n" * size,
+        "unclosed code": "[code]" * size,
+        "nested openers": "[b][i][u][s]" * size + "[/s]",
+        "closers only": "[/b][/i][/list][/quote]" * size,
+        "unclosed section": "[section:" * size,
+        "unclosed container": "[container:a" * size,
+        "unterminated mentions": "@[a" * size,
+        "mention without target": "@[a](" * size,
+        "unclosed image params": "[img:1|" * size,
+        "unclosed spotify": "[spotify:https://open.spotify.com/track/a?" * size,
+        "whitespace runs": " \t " * size + "[h1]x",
+        "mixed valid": "[p][b]bold[/b] and [i]it[/i][/p]\n" * size,
+    }
+
+
+def time_format(text):
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        format_bbcode(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def check_scaling(size):
+    passed = True
+    small_inputs = adversarial_inputs(size)
+    large_inputs = adversarial_inputs(size * 4)
+    print(f"{'input':<28} {'N s':>9} {'4N s':>9} {'ratio':>7}")
+    for name, small_text in small_inputs.items():
+        small_seconds = time_format(small_text)
+        large_seconds = time_format(large_inputs[name])
+        ratio = large_seconds / max(small_seconds, 1e-6)
+        ok = ratio <= MAX_SCALING_RATIO or large_seconds < 0.01
+        passed = passed and ok
+        print(f"{name:<28} {small_seconds:>9.4f} {large_seconds:>9.4f} {ratio:>6.1f}x{'' if ok else '  SUPER-LINEAR'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz and scaling checks for the BBCode formatter.")
+    parser.add_argument("--cases", type=int, default=2000, help="Random equivalence cases.")
+    parser.add_argument("--size", type=int, default=5000, help="Repetitions in the smaller adversarial inputs.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config.attempt_bbcode = True
+    config.inline_image_api_fallback_enabled = False
+    config.missing_inline_image_placeholder_enabled = False
+    equivalent = check_equivalence(args.cases, args.seed)
+    linear = check_scaling(args.size)
+    sys.exit(0 if equivalent and linear else 1)
+
+
+if __name__ == "__main__":
+    main()
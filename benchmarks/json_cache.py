@@ -0,0 +1,83 @@
+# Benchmark of the parsed-article cache (wa_parser/json_cache.py).
+#
+# Writes a synthetic export of large articles, then times plain json.load, a
+# cold load_json_file (parse + store) and a warm load_json_file (cache hit).
+#
+#     uv run python benchmarks/json_cache.py --articles 200 --article-kb 512
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from wa_parser import config  # noqa: E402
+from wa_parser.json_cache import load_json_file, prune_json_cache  # noqa: E402
+
+
+def build_article(number, target_bytes):
+    paragraph = f"[p]Paragraph of article {number} with [b]bold[/b] text and @[a link](article:{number:08d}).[/p]\n"
+    sections = {}
+    size = 0
+    section_number = 0
+    while size < target_bytes:
+        text = paragraph * 40
+        sections[f"section{section_number}"] = {"title": f"Section {section_number}", "content": text}
+        size += len(text)
+        section_number += 1
+    return {
+        "id": f"00000000-0000-0000-0000-{number:012d}",
+        "title": f"Cache Article {number}",
+        "templateType": "article",
+        "content": paragraph * 20,
+        "sections": sections,
+        "relations": [{"id": f"{related:08d}", "title": f"Related {related}"} for related in range(50)],
+    }
+
+
+def time_loads(label, paths, loader):
+    started = time.perf_counter()
+    for path in paths:
+        loader(path)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<26} {elapsed:>8.3f} s")
+    return elapsed
+
+
+def plain_json_load(path):
+    with open(path, "r", encoding="utf-8") as source_file:
+        return json.load(source_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parsed-article cache against json.load.")
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--article-kb", type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        paths = []
+        for number in range(args.articles):
+            path = os.path.join(root, "export", f"article-{number}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as article_file:
+                json.dump(build_article(number, args.article_kb * 1024), article_file)
+            paths.append(path)
+        config.json_cache_directory = os.path.join(root, "cache")
+
+        megabytes = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+        print(f"{len(paths)} articles, {megabytes:.1f} MB of JSON")
+        plain = time_loads("json.load", paths, plain_json_load)
+        time_loads("cache cold (parse+store)", paths, load_json_file)
+        warm = time_loads("cache warm", paths, load_json_file)
+        print(f"warm speedup:              {plain / max(warm, 1e-9):.1f}x")
+        removed, _ = prune_json_cache(max_megabytes=0)
+        print(f"pruned entries:            {removed}")
+
+
+if __name__ == "__main__":
+    main()
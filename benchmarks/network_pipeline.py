@@ -0,0 +1,141 @@
+# End-to-end benchmark of the network stages against the local stand-in server.
+#
+# Builds a synthetic export whose articles reference cover images, exported inline
+# images, images only the API knows about and images that do not exist at all,
+# then runs the full converter against benchmarks/standin_server.py and reports
+# conversion time, API fallback behaviour and download throughput.
+#
+#     uv run python benchmarks/network_pipeline.py --articles 200 --latency 0.02 --error-rate 0.05
+#
+# --local-binaries 0.5 pre-seeds a local image directory with half of the CDN
+# files, so those are imported from disk instead of downloaded.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from standin_server import StandInServer, add_settings_arguments, settings_from_args  # noqa: E402
+
+from wa_parser import cli, config  # noqa: E402
+
+
+def write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def build_export(root, server, articles, images_per_article):
+    export_directory = os.path.join(root, "export")
+    image_number = 0
+    for article_number in range(articles):
+        inline_tags = []
+        for _ in range(images_per_article):
+            image_id = 500000 + image_number
+            title = f"Bench Image {image_number}"
+            kind = image_number % 4
+            if kind in (0, 1):
+                record = server.add_image(image_id, title, api_visible=False)
+                write_json(os.path.join(export_directory, "images", f"{image_id}.json"), record)
+            elif kind == 2:
+                server.add_image(image_id, title)
+            inline_tags.append(f"[img:{image_id}|right|300]")
+            image_number += 1
+
+        cover = server.add_image(900000 + article_number, f"Bench Cover {article_number}", api_visible=False)
+        write_json(
+            os.path.join(export_directory, "articles", f"Article-Bench-{article_number}-abc.json"),
+            {
+                "id": f"00000000-0000-0000-0000-{article_number:012d}",
+                "title": f"Bench Article {article_number}",
+                "templateType": "article",
+                "entityClass": "Article",
+                "cover": {"url": cover["url"], "title": cover["title"]},
+                "content": "[p]Benchmark article.[/p]\n" + "\n".join(inline_tags),
+            },
+        )
+    return export_directory
+
+
+def write_local_binaries(root, server, fraction):
+    directory = os.path.join(root, "local-binaries")
+    os.makedirs(directory, exist_ok=True)
+    filenames = sorted(server.cdn_files)
+    for filename in filenames[: int(len(filenames) * fraction)]:
+        with open(os.path.join(directory, filename), "wb") as binary_file:
+            binary_file.write(server.payload_for(filename))
+    return directory
+
+
+def read_stage_events(events_path):
+    stages = {}
+    with open(events_path, "r", encoding="utf-8") as events_file:
+        for line in events_file:
+            event = json.loads(line)
+            if event.get("event") == "stage_finished":
+                stages[event["stage"]] = event
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WA-Parser network stages against a local stand-in.")
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--images-per-article", type=int, default=4)
+    parser.add_argument("--local-binaries", type=float, default=0.0, help="Fraction of CDN files found locally.")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root, StandInServer(settings=settings_from_args(args)) as server:
+        config.source_directory = build_export(root, server, args.articles, args.images_per_article)
+        config.destination_directory = os.path.join(root, "vault")
+        config.obsidian_resource_folder = os.path.join(root, "vault-images")
+        config.templates_directory = os.path.join(REPO_ROOT, "templates")
+        config.run_history_file = os.path.join(root, "history.json")
+        config.checkpoint_file = os.path.join(root, "checkpoint.json")
+        config.json_cache_directory = os.path.join(root, "json-cache")
+        config.run_manifest_file = os.path.join(root, "run-manifest.json")
+        config.image_size_history_file = os.path.join(root, "image-sizes.json")
+        config.local_image_directories = [write_local_binaries(root, server, args.local_binaries)]
+        config.inline_image_api_fallback_enabled = True
+        config.worldanvil_image_api_url_template = server.image_api_url_template
+        config.worldanvil_api_key = server.api_token
+        config.worldanvil_api_auth_header = server.auth_header
+        events_path = os.path.join(root, "events.jsonl")
+
+        sys.argv = ["WA-Parser.py", "--telemetry-events", events_path]
+        started = time.perf_counter()
+        try:
+            asyncio.run(cli.main(cli.parse_args()))
+        finally:
+            cli.telemetry.stop_telemetry()
+        wall_seconds = time.perf_counter() - started
+
+        stages = read_stage_events(events_path)
+        downloaded_files = len(os.listdir(config.obsidian_resource_folder))
+        server_stats = server.stats.as_dict()
+
+    print()
+    print(f"wall time:            {wall_seconds:.2f} s")
+    for stage_name in ("convert", "download", "api_lookup"):
+        stage = stages.get(stage_name)
+        if stage:
+            print(
+                f"{stage_name + ':':<21} {stage['count']} ok, {stage['errors']} errors, "
+                f"{stage['elapsed_seconds']:.2f} s, {stage['items_per_second']:.1f} items/s"
+            )
+    download = stages.get("download")
+    if download:
+        print(f"download throughput:  {download['bytes_per_second'] / (1024 * 1024):.2f} MiB/s")
+    print(f"images on disk:       {downloaded_files}")
+    print(f"stand-in server:      {json.dumps(server_stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Peak memory of rendering one large article to disk (wa_parser/processor.py).
+#
+# Renders a synthetic article with a large body and many sections twice: once
+# the way notes used to be built (template.render() into one string, copied
+# into a StringIO buffer and out again) and once through render_article, which
+# streams the template into a chunk list that is written out as is. Peak
+# allocations are measured with tracemalloc.
+#
+#     uv run python benchmarks/render_memory.py --content-mb 8 --sections 40
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from wa_parser import config  # noqa: E402
+from wa_parser.image_pipeline import begin_image_job_collection, end_image_job_collection  # noqa: E402
+from wa_parser.links import begin_link_collection, end_link_collection  # noqa: E402
+from wa_parser.processor import render_article  # noqa: E402
+from wa_parser.template_engine import render_its_template_body  # noqa: E402
+from wa_parser.writer import write_note_file  # noqa: E402
+
+
+def build_article(content_bytes, sections):
+    paragraph = "[p]A paragraph with [b]bold[/b] and [i]italic[/i] text, long enough to matter.[/p]\n"
+    repeats = max(1, content_bytes // len(paragraph))
+    section_text = paragraph * max(1, repeats // (4 * max(1, sections)))
+    return {
+        "id": "00000000-0000-0000-0000-000000000001",
+        "title": "Memory Article",
+        "templateType": "article",
+        "entityClass": "Article",
+        "content": paragraph * repeats,
+        "sections": {
+            f"section{number}": {"title": f"Section {number}", "content": section_text}
+            for number in range(sections)
+        },
+    }
+
+
+def render_as_string(data, path):
+    begin_image_job_collection()
+    begin_link_collection()
+    with io.StringIO() as markdown_file:
+        body = render_its_template_body(data, {}, False, "", template_name="article")
+        markdown_file.write(body)
+        markdown_file.write("\n")
+        text = markdown_file.getvalue()
+    write_note_file(path, text)
+    end_image_job_collection()
+    end_link_collection()
+    return os.path.getsize(path)
+
+
+def render_streamed(data, path):
+    _, chunks, _, _ = render_article(data, "memory.json", {}, os.path.dirname(path))
+    write_note_file(path, chunks)
+    return os.path.getsize(path)
+
+
+def measure(label, render, data, path):
+    tracemalloc.start()
+    note_bytes = render(data, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} peak {peak / (1024 * 1024):>8.1f} MB  ({peak / note_bytes:.1f}x the note)")
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of string and streamed note rendering.")
+    parser.add_argument("--content-mb", type=float, default=8.0)
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--bbcode", action="store_true", help="Include BBCode conversion in the measurement.")
+    args = parser.parse_args()
+
+    config.templates_directory = os.path.join(REPO_ROOT, "templates")
+    config.its_theme_support = True
+    config.article_time_budget_seconds = None
+    # BBCode conversion has its own transient peak (see bbcode_fuzz.py); keep it
+    # out so the numbers show the render and write stages.
+    config.attempt_bbcode = args.bbcode
+    data = build_article(int(args.content_mb * 1024 * 1024), args.sections)
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "note.md")
+        # Warm up the template cache so compilation is not part of either peak.
+        render_streamed(data, path)
+        string_peak = measure("render() to string", render_as_string, data, path)
+        streamed_peak = measure("streamed chunks", render_streamed, data, path)
+    print(f"peak reduction:        {string_peak / max(streamed_peak, 1):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
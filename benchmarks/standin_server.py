@@ -0,0 +1,317 @@
+# Local stand-in for the World Anvil image metadata API and image CDN.
+#
+# Serves:
+#   GET /api/image/<id>   image metadata JSON (auth header required, 404 for unknown ids)
+#   GET /cdn/<filename>   synthetic image bytes, throttled to the configured bandwidth
+#   POST /api/world/<kind>?id=<world>   paginated {"limit", "offset"} listing of articles, images or maps
+#   GET /api/<article|image|map>?id=<id>   full entity JSON for the API sync backend
+#
+# Latency, bandwidth, 5xx error rate, 429 rate and large payloads are configurable
+# so the network stages can be benchmarked without touching World Anvil.
+#
+#     uv run python benchmarks/standin_server.py --port 8765 --latency 0.05 --error-rate 0.02
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+API_TOKEN = "standin-token"
+AUTH_HEADER = "x-auth-token"
+WORLD_ID = "standin-world"
+ENTITY_KINDS = {"articles": "article", "images": "image", "maps": "map"}
+
+
+class StandInSettings:
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        bandwidth=None,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        retry_after=1,
+        image_bytes=64 * 1024,
+        large_payload_rate=0.0,
+        large_payload_bytes=8 * 1024 * 1024,
+        seed=1,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.image_bytes = image_bytes
+        self.large_payload_rate = large_payload_rate
+        self.large_payload_bytes = large_payload_bytes
+        self.seed = seed
+
+
+class StandInStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.statuses = {}
+        self.bytes_sent = 0
+
+    def record(self, status, nbytes=0):
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.bytes_sent += nbytes
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        self.dispatch(self.server.routes)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        self.dispatch(self.server.post_routes)
+
+    def dispatch(self, routes):
+        server = self.server
+        settings = server.settings
+        delay = settings.latency + (server.random.uniform(0, settings.jitter) if settings.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        path = urlparse(self.path).path
+        roll = server.random.random()
+        if roll < settings.rate_limit_rate:
+            return self.send_status(429, headers={"Retry-After": str(settings.retry_after)})
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            return self.send_status(503)
+
+        for prefix, handler in routes:
+            if path.startswith(prefix):
+                return handler(self, unquote(path[len(prefix):]))
+        return self.send_status(404)
+
+    def send_status(self, status, body=b"", content_type="text/plain", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.write_throttled(body)
+        self.server.stats.record(status, len(body))
+
+    def send_json(self, payload, status=200):
+        self.send_status(status, json.dumps(payload).encode("utf-8"), content_type="application/json")
+
+    def write_throttled(self, body):
+        bandwidth = self.server.settings.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        chunk_size = max(1024, int(bandwidth / 20))
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset:offset + chunk_size]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bandwidth)
+
+    def is_authorized(self):
+        return self.headers.get(self.server.auth_header) == self.server.api_token
+
+    def serve_image_metadata(self, image_id):
+        if not self.is_authorized():
+            return self.send_status(401)
+        record = self.server.images.get(image_id)
+        if record is None:
+            return self.send_status(404)
+        self.send_json({"success": True, "image": record})
+
+    def query_value(self, name):
+        return (parse_qs(urlparse(self.path).query).get(name) or [None])[0]
+
+    def serve_entity_list(self, kind):
+        if not self.is_authorized():
+            return self.send_status(401)
+        entities = self.server.entities.get(kind)
+        if entities is None or self.query_value("id") != self.server.world_id:
+            return self.send_status(404)
+        try:
+            request = json.loads(self.body or b"{}")
+            limit = max(1, int(request.get("limit", 50)))
+            offset = max(0, int(request.get("offset", 0)))
+        except (TypeError, ValueError):
+            return self.send_status(400)
+        page = [
+            {"id": record["id"], "title": record.get("title"), "updateDate": record.get("updateDate")}
+            for record in list(entities.values())[offset:offset + limit]
+        ]
+        self.send_json({"success": True, "entities": page})
+
+    def serve_entity(self, kind):
+        if not self.is_authorized():
+            return self.send_status(401)
+        record = self.server.entities[kind].get(self.query_value("id") or "")
+        if record is None:
+            return self.send_status(404)
+        self.send_json(record)
+
+    def serve_cdn(self, filename):
+        if filename not in self.server.cdn_files:
+            return self.send_status(404)
+        self.send_status(200, self.server.payload_for(filename), content_type="image/png")
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        settings=None,
+        api_token=API_TOKEN,
+        auth_header=AUTH_HEADER,
+        world_id=WORLD_ID,
+    ):
+        super().__init__((host, port), StandInHandler)
+        self.settings = settings or StandInSettings()
+        self.api_token = api_token
+        self.auth_header = auth_header
+        self.world_id = world_id
+        self.random = random.Random(self.settings.seed)
+        self.stats = StandInStats()
+        self.images = {}
+        self.cdn_files = set()
+        self.entities = {kind: {} for kind in ENTITY_KINDS}
+        self._payload_sizes = {}
+        self._thread = None
+        self.routes = [
+            ("/api/image/", StandInHandler.serve_image_metadata),
+            ("/cdn/", StandInHandler.serve_cdn),
+        ]
+        for kind, detail in ENTITY_KINDS.items():
+            self.routes.append((f"/api/{detail}", lambda handler, _, kind=kind: handler.serve_entity(kind)))
+        self.post_routes = [("/api/world/", StandInHandler.serve_entity_list)]
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base_url(self):
+        return f"{self.base_url}/api"
+
+    @property
+    def image_api_url_template(self):
+        return f"{self.base_url}/api/image/{{image_id}}"
+
+    def add_image(self, image_id, title, filename=None, api_visible=True):
+        filename = filename or f"{title}.png"
+        record = {"id": str(image_id), "title": title, "url": f"{self.base_url}/cdn/{filename}", "extension": "png"}
+        if api_visible:
+            self.images[str(image_id)] = record
+        self.cdn_files.add(filename)
+        return record
+
+    def add_entity(self, kind, record, update_date="2024-01-01 00:00:00"):
+        # Adding an entity again with a newer update_date is how tests simulate an edit.
+        record = dict(record, id=str(record["id"]), updateDate={"date": update_date, "timezone": "UTC"})
+        self.entities[kind][record["id"]] = record
+        return record
+
+    def remove_entity(self, kind, entity_id):
+        self.entities[kind].pop(str(entity_id), None)
+
+    def payload_for(self, filename):
+        size = self._payload_sizes.get(filename)
+        if size is None:
+            settings = self.settings
+            is_large = self.random.random() < settings.large_payload_rate
+            size = settings.large_payload_bytes if is_large else settings.image_bytes
+            self._payload_sizes[filename] = size
+        return b"\x89PNG\r\n\x1a\n" + b"\0" * max(0, size - 8)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="wa-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+
+
+def add_settings_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="Base response latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency up to this many seconds.")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Per-response bandwidth cap in bytes/second.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--image-bytes", type=int, default=64 * 1024, help="Size of a normal image payload.")
+    parser.add_argument("--large-payload-rate", type=float, default=0.0, help="Fraction of images served large.")
+    parser.add_argument("--large-payload-bytes", type=int, default=8 * 1024 * 1024, help="Size of a large payload.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for errors and payload sizes.")
+
+
+def settings_from_args(args):
+    return StandInSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        image_bytes=args.image_bytes,
+        large_payload_rate=args.large_payload_rate,
+        large_payload_bytes=args.large_payload_bytes,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in World Anvil API and image CDN.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--images", type=int, default=100, help="Number of synthetic images to serve.")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, settings_from_args(args))
+    for number in range(args.images):
+        server.add_image(100000 + number, f"Standin Image {number}")
+    print(f"Serving {args.images} images at {server.base_url}")
+    print(f"  worldanvil_image_api_url_template = {server.image_api_url_template!r}")
+    print(f"  worldanvil_api_key = {server.api_token!r}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
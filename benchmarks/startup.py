@@ -0,0 +1,142 @@
+# Cold-start benchmark for common WA-Parser invocations.
+#
+# Runs each invocation in a fresh interpreter with `python -X importtime` and
+# reports wall time, total import time and which heavy third-party modules were
+# loaded. Conversions run against a one-article throwaway export.
+#
+#     uv run python benchmarks/startup.py [--repeat 5] [--json results.json]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("httpx", "jinja2", "yaml", "tqdm")
+
+CONVERT_DRIVER = """
+import sys
+sys.path.insert(0, {repo_root!r})
+from wa_parser import config
+config.source_directory = {source!r}
+config.destination_directory = {destination!r}
+config.obsidian_resource_folder = {images!r}
+config.templates_directory = {templates!r}
+config.run_history_file = None
+config.checkpoint_file = {checkpoint!r}
+config.json_cache_directory = {json_cache!r}
+config.run_manifest_file = {run_manifest!r}
+config.image_size_history_file = {image_sizes!r}
+{overrides}
+sys.argv = ["WA-Parser.py"] + {argv!r}
+from wa_parser.cli import run
+run()
+"""
+
+
+def write_sample_export(root):
+    articles_directory = os.path.join(root, "export", "articles")
+    os.makedirs(articles_directory)
+    article = {
+        "id": "00000000-0000-0000-0000-000000000001",
+        "title": "Startup Sample",
+        "templateType": "article",
+        "entityClass": "Article",
+        "content": "[h1]Sample[/h1]\n[p]Plain [b]text[/b] without images.[/p]",
+    }
+    with open(os.path.join(articles_directory, "Article-Startup-Sample-abc.json"), "w", encoding="utf-8") as f:
+        json.dump(article, f)
+
+
+def build_invocations(root):
+    def convert(argv, overrides=""):
+        driver = CONVERT_DRIVER.format(
+            repo_root=REPO_ROOT,
+            source=os.path.join(root, "export"),
+            destination=os.path.join(root, "out"),
+            images=os.path.join(root, "images"),
+            templates=os.path.join(REPO_ROOT, "templates"),
+            checkpoint=os.path.join(root, "checkpoint.json"),
+            json_cache=os.path.join(root, "json-cache"),
+            run_manifest=os.path.join(root, "run-manifest.json"),
+            image_sizes=os.path.join(root, "image-sizes.json"),
+            overrides=overrides,
+            argv=argv,
+        )
+        return ["-c", driver]
+
+    plain_overrides = "\n".join(
+        [
+            "config.its_theme_support = False",
+            "config.inline_image_api_fallback_enabled = False",
+            "config.leaflet_plugin_support = False",
+        ]
+    )
+    return [
+        ("help", [os.path.join(REPO_ROOT, "WA-Parser.py"), "--help"]),
+        ("single-file", convert(["--file-regex", "Startup-Sample", "--write-workers", "0"])),
+        ("single-file-plain", convert(["--file-regex", "Startup-Sample", "--write-workers", "0"], plain_overrides)),
+    ]
+
+
+def parse_importtime(stderr):
+    total_us = 0
+    loaded = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        total_us += int(self_us)
+        loaded.add(name.strip().split(".")[0])
+    return total_us / 1000, sorted(module for module in HEAVY_MODULES if module in loaded)
+
+
+def measure(arguments, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", *arguments],
+            capture_output=True,
+            text=True,
+            cwd=REPO_ROOT,
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr[-2000:])
+        import_ms, heavy_modules = parse_importtime(completed.stderr)
+        result = {"wall_ms": round(wall_ms, 1), "import_ms": round(import_ms, 1), "heavy_modules": heavy_modules}
+        if best is None or result["wall_ms"] < best["wall_ms"]:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure WA-Parser cold-start time.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per invocation; the fastest is reported.")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        write_sample_export(root)
+        for name, arguments in build_invocations(root):
+            results[name] = measure(arguments, max(1, args.repeat))
+
+    print(f"{'invocation':<20} {'wall ms':>9} {'import ms':>10}  heavy modules")
+    for name, result in results.items():
+        heavy = ", ".join(result["heavy_modules"]) or "-"
+        print(f"{name:<20} {result['wall_ms']:>9} {result['import_ms']:>10}  {heavy}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Time of --verify over a generated vault (wa_parser/verify.py).
+#
+# Writes a synthetic vault (many small notes, some large images), records it in
+# a run manifest the way a conversion run does and checks it once with a
+# single hashing thread and once with verify_workers threads. Images at least
+# utils.MMAP_MIN_BYTES large are hashed through a memory map. The page cache is warm
+# for both passes, so the numbers show hashing throughput, not disk reads.
+#
+#     uv run python benchmarks/verify.py --notes 20000 --images 200 --image-mb 4
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from wa_parser import config, verify  # noqa: E402
+from wa_parser.writer import write_note_file  # noqa: E402
+
+
+def build_vault(root, notes, note_kb, images, image_mb):
+    notes_root = os.path.join(root, "notes")
+    images_root = os.path.join(root, "images")
+    os.makedirs(images_root)
+    manifest = verify.start_run_manifest(os.path.join(root, "manifest.json"), notes_root, images_root)
+    line = "A line of note text with a [[Link]] and some **bold** words.\n"
+    body = line * max(1, note_kb * 1024 // len(line))
+    for number in range(notes):
+        path = os.path.join(notes_root, f"folder-{number % 50}", f"Note {number}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        text = f"# Note {number}\n{body}"
+        write_note_file(path, text)
+        manifest.record_note(path, text)
+    for number in range(images):
+        data = os.urandom(int(image_mb * 1024 * 1024))
+        path = os.path.join(images_root, f"Image {number}.png")
+        with open(path, "wb") as image_file:
+            image_file.write(data)
+        manifest.record_image(path, data)
+    verify.finish_run_manifest()
+    return manifest.path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time --verify with one and with several hashing threads.")
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--note-kb", type=int, default=8)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--image-mb", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=None, help="Hashing threads (default: verify_workers).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        started = time.perf_counter()
+        manifest_path = build_vault(root, args.notes, args.note_kb, args.images, args.image_mb)
+        print(f"built vault in {time.perf_counter() - started:.1f}s")
+        timings = {}
+        for label, workers in (("1 thread", 1), ("parallel", args.workers or config.verify_workers)):
+            config.verify_workers = workers
+            started = time.perf_counter()
+            problems = verify.verify_run_manifests([manifest_path])
+            timings[label] = time.perf_counter() - started
+            if problems:
+                print(f"{label}: {problems} problems reported on an untouched vault")
+    print(f"speedup:        {timings['1 thread'] / max(timings['parallel'], 1e-9):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import json
+import os
+
+from wa_parser import writer as writer_module
+from wa_parser.converter import Converter
+from wa_parser.settings import Settings
+
+
+def write_export(root, articles):
+    articles_directory = os.path.join(root, "articles")
+    os.makedirs(articles_directory)
+    for number in range(articles):
+        article = {
+            "id": f"00000000-0000-0000-0000-{number:012d}",
+            "title": f"Article {number}",
+            "templateType": "article",
+            "entityClass": "Article",
+            "content": f"[p]Article {number}.[/p]",
+        }
+        with open(os.path.join(articles_directory, f"article-{number}.json"), "w", encoding="utf-8") as f:
+            json.dump(article, f)
+
+
+def test_convert_export_reports_notes_the_writer_could_not_write(tmp_path, monkeypatch):
+    write_export(str(tmp_path / "export"), 3)
+    write_note_file = writer_module.write_note_file
+
+    def failing_write(path, text):
+        if os.path.basename(path) == "Article 1.md":
+            raise OSError("disk full")
+        write_note_file(path, text)
+
+    monkeypatch.setattr(writer_module, "write_note_file", failing_write)
+    settings = Settings(
+        source_directory=str(tmp_path / "export"),
+        destination_directory=str(tmp_path / "vault"),
+        obsidian_resource_folder=str(tmp_path / "images"),
+        json_cache_directory=None,
+    )
+    with Converter(settings) as converter:
+        _, failures = converter.convert_export(write_workers=2)
+
+    assert [os.path.basename(json_file) for json_file in failures] == ["article-1.json"]
+    assert failures[str(tmp_path / "export" / "articles" / "article-1.json")] == "The note could not be written."
@@ -0,0 +1,21 @@
+import warnings
+import zipfile
+
+from wa_parser.packing import ZipNoteWriter
+
+
+def test_zip_pack_keeps_last_note_per_path(tmp_path):
+    archive_path = tmp_path / "vault.zip"
+    root_directory = tmp_path / "vault"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with ZipNoteWriter(str(archive_path), str(root_directory)) as writer:
+            writer.submit(str(root_directory / "people" / "Ada.md"), "first")
+            writer.submit(str(root_directory / "places" / "Town.md"), ["town"])
+            writer.submit(str(root_directory / "people" / "Ada.md"), ["sec", "ond"])
+
+    with zipfile.ZipFile(archive_path) as archive:
+        assert archive.namelist() == ["people/Ada.md", "places/Town.md"]
+        assert archive.read("people/Ada.md") == b"second"
+        assert archive.read("places/Town.md") == b"town"
+        assert archive.getinfo("people/Ada.md").compress_type == zipfile.ZIP_DEFLATED
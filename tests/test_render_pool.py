@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Builds the converter's HTTP client before the render pool forks, then renders
+# articles whose inline images only the API knows about. The API URL points at
+# a closed port, so every lookup fails fast once a worker has a live client.
+CONVERT_WITH_PREBUILT_CLIENT = textwrap.dedent(
+    """
+    import sys
+
+    from wa_parser.converter import Converter
+    from wa_parser.settings import Settings
+
+    source_directory, destination_directory = sys.argv[1:3]
+    settings = Settings(
+        source_directory=source_directory,
+        destination_directory=destination_directory,
+        obsidian_resource_folder=destination_directory + "/images",
+        worldanvil_image_api_url_template="http://127.0.0.1:9/images/{image_id}",
+        worldanvil_api_key="test-key",
+        download_timeout_seconds=5.0,
+        json_cache_directory=None,
+    )
+    with Converter(settings) as converter:
+        converter.ensure_http_client()
+        image_jobs, failures = converter.convert_export(render_workers=2)
+    print(len(converter.link_graph.outgoing), len(failures))
+    """
+)
+
+
+def write_export(root, articles):
+    articles_directory = os.path.join(root, "articles")
+    os.makedirs(articles_directory)
+    for number in range(articles):
+        article = {
+            "id": f"00000000-0000-0000-0000-{number:012d}",
+            "title": f"Pool Article {number}",
+            "templateType": "article",
+            "entityClass": "Article",
+            "content": f"[p]Article {number}.[/p]\n[img:{700000 + number}|right|300]",
+        }
+        with open(os.path.join(articles_directory, f"Article-Pool-{number}-abc.json"), "w", encoding="utf-8") as f:
+            json.dump(article, f)
+
+
+def test_render_workers_with_prebuilt_http_client(tmp_path):
+    source_directory = tmp_path / "export"
+    destination_directory = tmp_path / "vault"
+    write_export(str(source_directory), 4)
+    result = subprocess.run(
+        [sys.executable, "-c", CONVERT_WITH_PREBUILT_CLIENT, str(source_directory), str(destination_directory)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-2:] == ["4", "0"]
+
+
+def test_batch_with_render_workers(tmp_path):
+    write_export(str(tmp_path / "export"), 4)
+    worlds = [
+        {
+            "name": name,
+            "source_directory": str(tmp_path / "export"),
+            "destination_directory": str(tmp_path / name / "vault"),
+            "obsidian_resource_folder": str(tmp_path / name / "images"),
+            "settings": {
+                "worldanvil_image_api_url_template": "http://127.0.0.1:9/images/{image_id}",
+                "worldanvil_api_key": "test-key",
+                "json_cache_directory": None,
+                "run_manifest_file": str(tmp_path / name / "run-manifest.json"),
+            },
+        }
+        for name in ("first", "second")
+    ]
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"worlds": worlds}), encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, "WA-Parser.py", "--batch", str(manifest_path), "--jobs", "2"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "[second] 4 notes" in result.stdout
@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from wa_parser.utils import list_json_files
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONVERT = textwrap.dedent(
+    """
+    import sys
+
+    from wa_parser import cli, config
+
+    config.source_directory, config.destination_directory, config.run_history_file = sys.argv[1:4]
+    config.obsidian_resource_folder = config.destination_directory + "-images"
+    config.checkpoint_file = config.destination_directory + "-checkpoint.json"
+    config.json_cache_directory = None
+    config.run_manifest_file = None
+    sys.argv = ["WA-Parser.py"] + sys.argv[4:]
+    cli.run()
+    """
+)
+
+
+def write_article(path, number, content):
+    article = {
+        "id": f"00000000-0000-0000-0000-{number:012d}",
+        "title": "Shared Title",
+        "templateType": "article",
+        "entityClass": "Article",
+        "content": f"[p]{content}[/p]",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(article, f)
+
+
+def convert(tmp_path, name, export_order, *args):
+    destination_directory = tmp_path / name
+    history_path = tmp_path / f"{name}-history.json"
+    # Later articles in export order are recorded as slower, so longest-first
+    # scheduling renders the export in reverse.
+    timings = {f"articles/{os.path.basename(path)}": position + 1.0 for position, path in enumerate(export_order)}
+    history = {"articles": timings}
+    history_path.write_text(json.dumps(history), encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, "-c", CONVERT, str(tmp_path / "export"), str(destination_directory), str(history_path), *args],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    notes = {}
+    for root, _, files in os.walk(destination_directory):
+        for filename in files:
+            with open(os.path.join(root, filename), encoding="utf-8") as note_file:
+                notes[os.path.relpath(os.path.join(root, filename), destination_directory)] = note_file.read()
+    return notes
+
+
+def test_colliding_notes_keep_the_last_article_in_export_order(tmp_path):
+    articles_directory = tmp_path / "export" / "articles"
+    articles_directory.mkdir(parents=True)
+    for number in range(3):
+        write_article(articles_directory / f"article-{number}.json", number, f"Body of article {number}.")
+    export_order = list_json_files(str(tmp_path / "export"))
+    last_article = os.path.splitext(os.path.basename(export_order[-1]))[0]
+
+    serial = convert(tmp_path, "serial", export_order)
+    parallel = convert(tmp_path, "parallel", export_order, "--jobs", "2")
+    assert len(serial) == 1
+    assert f"Body of {last_article.replace('-', ' ')}." in next(iter(serial.values()))
+    assert parallel == serial
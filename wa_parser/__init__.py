@@ -1,3 +1,5 @@
 from .cli import main, run
+from .converter import Converter
+from .settings import Settings
 
-__all__ = ["main", "run"]
+__all__ = ["Converter", "Settings", "main", "run"]
@@ -0,0 +1,207 @@
+import json
+import os
+import re
+
+from . import config, telemetry
+from .image_pipeline import RETRYABLE_STATUS_CODES, parse_retry_after
+from .utils import write_json_atomically
+
+
+# Listing endpoint, detail endpoint and local export folder per entity kind.
+SYNC_KINDS = {
+    "articles": ("world/articles", "article"),
+    "images": ("world/images", "image"),
+    "maps": ("world/maps", "map"),
+}
+
+
+def load_sync_state(state_path):
+    try:
+        with open(state_path, "r", encoding="utf-8") as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get("world") != config.worldanvil_world_id:
+        return {}
+    return state
+
+
+def save_sync_state(state_path, state):
+    write_json_atomically(state_path, state, sort_keys=True)
+
+
+def entity_update_marker(entity):
+    # updateDate is either a plain string or {"date": ..., "timezone": ...}.
+    update_date = entity.get("updateDate")
+    if isinstance(update_date, dict):
+        update_date = update_date.get("date")
+    return str(update_date) if update_date else None
+
+
+def entity_export_path(source_directory, kind, entity):
+    entity_id = str(entity.get("id"))
+    if kind == "images":
+        return os.path.join(source_directory, "images", f"{entity_id}.json")
+    if kind == "maps":
+        return os.path.join(source_directory, "maps", entity_id, "map.json")
+    template = re.sub(r"[^A-Za-z0-9]+", "", str(entity.get("templateType") or "article")) or "article"
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", str(entity.get("title") or "")).strip("-")
+    return os.path.join(source_directory, "articles", f"{template}-{slug}-{entity_id}.json")
+
+
+def write_entity(path, entity):
+    write_json_atomically(path, entity, ensure_ascii=False)
+
+
+async def api_request(client, semaphore, method, url, **kwargs):
+    import asyncio
+
+    attempts = max(1, config.worldanvil_api_retries + 1)
+    async with semaphore:
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await client.request(method, url, **kwargs)
+            except Exception as exc:
+                telemetry.record("api_sync", error=exc)
+                if last_attempt:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES and not last_attempt:
+                await asyncio.sleep(parse_retry_after(response) or 0.5 * 2 ** attempt)
+                continue
+            response.raise_for_status()
+            telemetry.record("api_sync", nbytes=len(response.content))
+            return response.json()
+
+
+async def list_entities(client, semaphore, kind):
+    # Pages are requested a wave at a time; the first short page ends the listing.
+    import asyncio
+
+    list_path = SYNC_KINDS[kind][0]
+    url = f"{config.worldanvil_api_base_url.rstrip('/')}/{list_path}"
+    page_size = max(1, config.api_sync_page_size)
+    wave_size = max(1, config.api_sync_concurrency)
+    entities = []
+    offset = 0
+    while True:
+        pages = await asyncio.gather(
+            *(
+                api_request(
+                    client,
+                    semaphore,
+                    "POST",
+                    url,
+                    params={"id": config.worldanvil_world_id},
+                    json={"limit": page_size, "offset": offset + page * page_size},
+                )
+                for page in range(wave_size)
+            )
+        )
+        for payload in pages:
+            page_entities = (payload or {}).get("entities") or []
+            entities.extend(entity for entity in page_entities if isinstance(entity, dict) and entity.get("id"))
+            if len(page_entities) < page_size:
+                return entities
+        offset += wave_size * page_size
+
+
+async def fetch_entity(client, semaphore, kind, entity_id):
+    detail_path = SYNC_KINDS[kind][1]
+    url = f"{config.worldanvil_api_base_url.rstrip('/')}/{detail_path}"
+    payload = await api_request(client, semaphore, "GET", url, params={"id": entity_id, "granularity": "2"})
+    if isinstance(payload, dict) and isinstance(payload.get(detail_path), dict):
+        payload = payload[detail_path]
+    return payload if isinstance(payload, dict) and payload.get("id") else None
+
+
+async def sync_kind(client, semaphore, kind, source_directory, known):
+    # Returns (new known-state for this kind, changed file paths, removed file paths).
+    import asyncio
+
+    listed = await list_entities(client, semaphore, kind)
+    current = {}
+    stale = []
+    for entity in listed:
+        entity_id = str(entity["id"])
+        marker = entity_update_marker(entity)
+        previous = known.get(entity_id)
+        if previous and marker and previous.get("updateDate") == marker and os.path.exists(previous.get("path", "")):
+            current[entity_id] = previous
+        else:
+            stale.append((entity_id, marker))
+
+    fetched = await asyncio.gather(
+        *(fetch_entity(client, semaphore, kind, entity_id) for entity_id, _ in stale),
+        return_exceptions=True,
+    )
+    changed = []
+    for (entity_id, marker), entity in zip(stale, fetched):
+        if isinstance(entity, Exception) or entity is None:
+            print(f"Failed to sync {kind[:-1]} {entity_id}: {entity or 'empty response'}")
+            if entity_id in known:
+                current[entity_id] = known[entity_id]
+            continue
+        path = entity_export_path(source_directory, kind, entity)
+        previous_path = (known.get(entity_id) or {}).get("path")
+        if previous_path and previous_path != path and os.path.exists(previous_path):
+            os.remove(previous_path)
+        write_entity(path, entity)
+        current[entity_id] = {"updateDate": entity_update_marker(entity) or marker, "path": path}
+        changed.append(path)
+
+    removed = []
+    for entity_id, entry in known.items():
+        if entity_id not in current and os.path.exists(entry.get("path", "")):
+            os.remove(entry["path"])
+            removed.append(entry["path"])
+    return current, changed, removed
+
+
+async def sync_from_api(source_directory, state_path=None, client=None):
+    # Mirrors the world into source_directory in the same layout as a manual
+    # export and returns the entity files that changed since the last sync.
+    import asyncio
+
+    import httpx
+
+    if not config.worldanvil_api_base_url or not config.worldanvil_world_id or not config.worldanvil_api_key:
+        raise ValueError("API sync needs worldanvil_api_base_url, worldanvil_world_id and worldanvil_api_key.")
+
+    state_path = state_path or config.api_sync_state_file
+    state = load_sync_state(state_path)
+    known_entities = state.get("entities") or {}
+    headers = {config.worldanvil_api_auth_header: config.worldanvil_api_key}
+    if config.worldanvil_application_key:
+        headers["x-application-key"] = config.worldanvil_application_key
+    semaphore = asyncio.Semaphore(max(1, config.api_sync_concurrency))
+
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(timeout=config.worldanvil_api_timeout_seconds, headers=headers)
+    else:
+        client.headers.update(headers)
+
+    telemetry.stage_started("api_sync")
+    try:
+        results = await asyncio.gather(
+            *(
+                sync_kind(client, semaphore, kind, source_directory, known_entities.get(kind) or {})
+                for kind in SYNC_KINDS
+            )
+        )
+    finally:
+        telemetry.stage_finished("api_sync")
+        if owns_client:
+            await client.aclose()
+
+    new_state = {"world": config.worldanvil_world_id, "entities": {}}
+    changed_files = []
+    for kind, (current, changed, removed) in zip(SYNC_KINDS, results):
+        new_state["entities"][kind] = current
+        changed_files.extend(changed)
+        print(f"Synced {kind}: {len(current)} total, {len(changed)} updated, {len(removed)} removed")
+    save_sync_state(state_path, new_state)
+    return changed_files
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+
+from . import config, verify
+from .concurrency import CircuitBreaker
+from .converter import Converter
+from .http_client import SharedHttpClient, print_connection_summary
+from .image_pipeline import print_api_lookup_summary
+from .json_cache import prune_json_cache
+from .settings import Settings
+from .template_engine import build_template_environment
+from .writer import NoteWriter
+
+
+WORLD_PATH_KEYS = ("source_directory", "destination_directory", "obsidian_resource_folder", "templates_directory")
+
+
+def load_batch_manifest(manifest_path):
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        if manifest_path.lower().endswith(".json"):
+            manifest = json.load(manifest_file)
+        else:
+            import yaml
+
+            manifest = yaml.safe_load(manifest_file)
+
+    worlds = (manifest or {}).get("worlds") if isinstance(manifest, dict) else manifest
+    if not isinstance(worlds, list) or not worlds:
+        raise ValueError(f"Batch manifest {manifest_path} must list at least one world under 'worlds'.")
+
+    # Relative paths are resolved against the manifest, not the working directory.
+    manifest_directory = os.path.dirname(os.path.abspath(manifest_path))
+    resolved_worlds = []
+    for number, world in enumerate(worlds, start=1):
+        if not isinstance(world, dict):
+            raise ValueError(f"World #{number} in {manifest_path} must be a mapping.")
+        overrides = dict(world.get("settings") or {})
+        for key in WORLD_PATH_KEYS:
+            if world.get(key):
+                overrides[key] = world[key]
+        for key in ("source_directory", "destination_directory", "obsidian_resource_folder"):
+            if not overrides.get(key):
+                raise ValueError(f"World #{number} in {manifest_path} is missing '{key}'.")
+        for key in WORLD_PATH_KEYS:
+            if overrides.get(key):
+                overrides[key] = os.path.join(manifest_directory, os.path.expanduser(overrides[key]))
+        name = world.get("name") or os.path.basename(os.path.normpath(overrides["source_directory"]))
+        resolved_worlds.append((name, overrides))
+    return resolved_worlds
+
+
+def world_state_path(path, name):
+    # Per-world variant of a state file in the working directory, e.g.
+    # .wa-parser-run-manifest.Kethra.json.
+    if not path:
+        return path
+    root, extension = os.path.splitext(path)
+    slug = re.sub(r"[^\w.-]+", "-", name).strip("-.") or "world"
+    return f"{root}.{slug}{extension}"
+
+
+async def run_batch(
+    manifest_path, write_workers=None, use_template_folders=True, render_workers=None, add_backlinks=None
+):
+    # One process, writer pool, Jinja environment per templates directory, HTTP
+    # client (API lookups and downloads), API image cache and API circuit
+    # breaker for every world; each world gets its own Converter so indexes,
+    # link graphs and outputs stay separate. Render workers are started per
+    # world, because they hold that world's indexes.
+    worlds = load_batch_manifest(manifest_path)
+    write_workers = config.write_workers if write_workers is None else write_workers
+    template_environments = {}
+    api_image_cache = {}
+    api_breaker = CircuitBreaker()
+    results = []
+    writer = NoteWriter(workers=write_workers, track_written=True) if write_workers > 0 else None
+    http_client = None
+
+    def shared_http_client():
+        # Built on first use; forked render workers drop it and build their own.
+        nonlocal http_client
+        if http_client is None:
+            http_client = SharedHttpClient()
+        return http_client
+
+    try:
+        for name, overrides in worlds:
+            settings = Settings(**overrides)
+            templates_directory = settings.templates_directory
+            if templates_directory not in template_environments:
+                template_environments[templates_directory] = build_template_environment(templates_directory)
+
+            print(f"[{name}] converting {settings.source_directory} -> {settings.destination_directory}")
+            os.makedirs(settings.destination_directory, exist_ok=True)
+            os.makedirs(settings.obsidian_resource_folder, exist_ok=True)
+            converter = Converter(
+                settings,
+                template_environment=template_environments[templates_directory],
+                api_image_cache=api_image_cache,
+                api_breaker=api_breaker,
+                api_client_factory=shared_http_client,
+            )
+            manifest_file = settings.run_manifest_file
+            if "run_manifest_file" not in overrides:
+                manifest_file = world_state_path(manifest_file, name)
+            verify.start_run_manifest(
+                manifest_file, settings.destination_directory, settings.obsidian_resource_folder
+            )
+            await converter.prepare_map_tiles()
+            image_jobs, failures = converter.convert_export(
+                use_template_folders=use_template_folders,
+                writer=writer,
+                render_workers=render_workers,
+            )
+            if writer is not None:
+                writer.flush()
+            converter.check_links(add_backlinks=add_backlinks)
+            await converter.download_images(image_jobs)
+            verify.finish_run_manifest()
+            notes = len(converter.link_graph.outgoing)
+            results.append((name, notes, len(image_jobs), failures))
+            print(f"[{name}] {notes} notes, {len(image_jobs)} images, {len(failures)} failures")
+            for json_file, error in sorted(failures.items()):
+                print(f"  {json_file}: {error}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if http_client is not None:
+            http_client.close()
+    print_api_lookup_summary(api_breaker.summary())
+    if http_client is not None:
+        print_connection_summary(http_client.stats.summary())
+    prune_json_cache()
+    return results
@@ -0,0 +1,83 @@
+import json
+import os
+
+from .utils import atomic_output, write_json_atomically
+
+
+CHECKPOINT_VERSION = 2
+
+
+def new_checkpoint(output_directory, use_template_folders):
+    return {
+        "version": CHECKPOINT_VERSION,
+        "output_directory": os.path.abspath(output_directory),
+        "use_template_folders": bool(use_template_folders),
+        "completed": [],
+        "failed": {},
+        "image_jobs": [],
+    }
+
+
+def checkpoint_log_path(checkpoint_path):
+    return f"{checkpoint_path}.log"
+
+
+def load_checkpoint(checkpoint_path, output_directory, use_template_folders):
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+
+    expected = new_checkpoint(output_directory, use_template_folders)
+    for key in ("output_directory", "use_template_folders"):
+        if checkpoint.get(key) != expected[key]:
+            print(f"Checkpoint {checkpoint_path} was written for a different {key}; starting over.")
+            return None
+
+    # Progress lives in an append-only JSON-lines log next to the checkpoint;
+    # a line cut short by an interruption ends the replay.
+    try:
+        with open(checkpoint_log_path(checkpoint_path), "r", encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                expected["completed"].extend(entry.get("completed") or [])
+                expected["image_jobs"].extend(entry.get("image_jobs") or [])
+                expected["failed"].update(entry.get("failed") or {})
+    except OSError:
+        pass
+    for article_key in expected["completed"]:
+        expected["failed"].pop(article_key, None)
+    return expected
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    # Writes the header and a compacted log of everything recorded so far;
+    # later progress is added with append_checkpoint.
+    progress = {key: checkpoint[key] for key in ("completed", "failed", "image_jobs")}
+    with atomic_output(checkpoint_log_path(checkpoint_path)) as log_file:
+        log_file.write(json.dumps(progress) + "\n")
+    header = {key: checkpoint[key] for key in ("version", "output_directory", "use_template_folders")}
+    write_json_atomically(checkpoint_path, header)
+
+
+def append_checkpoint(checkpoint_path, completed=(), image_jobs=(), failed=None):
+    # One line per save, so a save costs only the progress made since the last.
+    entry = {key: value for key, value in (("completed", completed), ("image_jobs", image_jobs), ("failed", failed)) if value}
+    if not entry:
+        return
+    with open(checkpoint_log_path(checkpoint_path), "a", encoding="utf-8") as log_file:
+        log_file.write(json.dumps(entry) + "\n")
+
+
+def clear_checkpoint(checkpoint_path):
+    for path in (checkpoint_path, checkpoint_log_path(checkpoint_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
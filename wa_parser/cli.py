@@ -1,16 +1,45 @@
 import argparse
-import asyncio
+import glob
 import os
 import re
+import time
 
-from tqdm import tqdm
-
-from . import config
-from .fields import build_id_title_index
-from .image_pipeline import build_local_image_index, download_images, local_image_index
+from . import config, links, telemetry, verify
+from .api_sync import sync_from_api
+from .batch import run_batch
+from .checkpoint import append_checkpoint, clear_checkpoint, load_checkpoint, new_checkpoint, save_checkpoint
+from .compact import peak_memory_mb
+from .fields import build_id_title_index, clear_field_fragment_cache
+from .http_client import close_shared_client, print_connection_summary
+from .image_pipeline import (
+    build_local_image_index,
+    download_images,
+    local_image_index,
+    merge_image_jobs,
+    print_api_lookup_summary,
+    reset_api_breaker,
+)
+from .image_processing import postprocess_images
+from .json_cache import prune_json_cache
+from .map_tiles import prepare_map_tiles
 from .maps import build_map_index, set_map_index
-from .processor import process_json_file
+from .packing import ZipNoteWriter, is_zip_pack_path, sync_staging_directory
+from .processor import begin_note_claims, end_note_claims, process_json_file, write_rendered_note
+from .render_pool import describe_error, render_with_pool
+from .scheduling import history_key, load_run_history, order_by_estimated_cost, save_run_history
+from .sharding import (
+    default_manifest_path,
+    load_title_index,
+    merge_shard_manifests,
+    parse_shard,
+    relative_file_ids,
+    save_title_index,
+    select_shard,
+    shard_path,
+    write_shard_manifest,
+)
 from .utils import list_json_files, select_json_files
+from .writer import NoteWriter
 
 
 def parse_args():
@@ -39,52 +68,427 @@ def parse_args():
         action="store_true",
         help="Write markdown files directly in output directory root (no template subfolders). Useful for debugging.",
     )
+    parser.add_argument(
+        "--streaming",
+        dest="streaming",
+        action="store_true",
+        help="Bounded-memory mode for very large exports: compact indexes and peak memory reporting.",
+    )
+    parser.add_argument(
+        "--write-workers",
+        dest="write_workers",
+        type=int,
+        default=None,
+        help="Number of background threads writing markdown files (0 writes synchronously).",
+    )
+    parser.add_argument(
+        "--pack",
+        dest="pack",
+        default=None,
+        help=(
+            "Write all notes into one .zip archive, or into a local staging directory whose changed files "
+            "are synced into the output directory when the run ends."
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        help="Number of render worker processes (default: render_workers from config).",
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint instead of starting over.",
+    )
+    parser.add_argument(
+        "--telemetry-events",
+        dest="telemetry_events",
+        default=None,
+        help="Append JSON-lines telemetry events (stage progress, rates, errors, ETA) to this file.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        default=None,
+        help="Keep a Prometheus-format metrics textfile refreshed at this path during the run.",
+    )
+    parser.add_argument(
+        "--link-report",
+        dest="link_report",
+        default=None,
+        help="Write every broken [[link]] (source note, missing target) to this file.",
+    )
+    parser.add_argument(
+        "--backlinks",
+        dest="backlinks",
+        action="store_true",
+        help="Append a Backlinks section to every note that other notes link to.",
+    )
+    parser.add_argument(
+        "--verify",
+        dest="verify",
+        nargs="*",
+        metavar="MANIFEST",
+        default=None,
+        help="Check the notes and images against run manifests (default: run_manifest_file) instead of converting.",
+    )
+    parser.add_argument(
+        "--batch",
+        dest="batch",
+        default=None,
+        help="Convert every world listed in this YAML/JSON manifest in one process.",
+    )
+    parser.add_argument(
+        "--sync",
+        dest="sync",
+        action="store_true",
+        help="Fetch changed articles, images and maps from the World Anvil API first and convert only those.",
+    )
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        default=None,
+        help="Convert only shard i of N (for example 2/8), partitioned by article ID hash; downloads are deferred.",
+    )
+    parser.add_argument(
+        "--shard-manifest",
+        dest="shard_manifest",
+        default=None,
+        help="Where a --shard run writes its image-job and link manifest (default: wa-shard-i-of-N.json).",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        dest="merge_shards",
+        nargs="+",
+        default=None,
+        help="Merge shard manifests: validate links across all shards and download every image once.",
+    )
+    parser.add_argument(
+        "--title-index",
+        dest="title_index",
+        default=None,
+        help="Load the id-to-title index from this precomputed file instead of scanning the export.",
+    )
+    parser.add_argument(
+        "--write-title-index",
+        dest="write_title_index",
+        default=None,
+        help="Build the id-to-title index, write it to this file and exit.",
+    )
     return parser.parse_args()
 
 
-async def main():
-    args = parse_args()
+def convert_json_files(json_files, id_to_title, output_directory, use_template_folders, writer, render_workers):
+    # Yields (json_file, image_jobs, seconds, error); a failing article is
+    # reported through error and never stops the remaining conversions.
+    if render_workers > 1:
+        for json_file, markdown_filename, markdown_text, image_jobs, note_links, seconds, error in render_with_pool(
+            json_files, id_to_title, output_directory, use_template_folders, render_workers
+        ):
+            if not error:
+                write_rendered_note(markdown_filename, markdown_text, writer, note_links, source_file=json_file)
+            yield json_file, image_jobs, seconds, error
+        return
+
+    for json_file in json_files:
+        started = time.perf_counter()
+        try:
+            image_jobs = process_json_file(
+                json_file,
+                id_to_title,
+                output_directory=output_directory,
+                use_template_folders=use_template_folders,
+                writer=writer,
+            )
+        except Exception as exc:
+            yield json_file, [], time.perf_counter() - started, describe_error(exc)
+            continue
+        yield json_file, image_jobs, time.perf_counter() - started, None
+
+
+def confirm_written(writer, unwritten, progress):
+    # An article whose note is still queued is not "completed" until the
+    # writer reports the note on disk; rendering never waits for it.
+    if writer is None or not getattr(writer, "track_written", False):
+        return
+    for json_file in writer.take_written():
+        article_key = unwritten.pop(json_file, None)
+        if article_key is not None:
+            progress["completed"].append(article_key)
+
+
+def save_progress(checkpoint_path, progress, writer, unwritten):
+    # Appends only what happened since the last save to the checkpoint log.
+    confirm_written(writer, unwritten, progress)
+    append_checkpoint(checkpoint_path, **progress)
+    progress["completed"], progress["image_jobs"], progress["failed"] = [], [], {}
+
+
+async def merge_shards(args, output_directory):
+    image_jobs, failed_articles = merge_shard_manifests(args.merge_shards, output_directory)
+    print(
+        f"Merged {len(args.merge_shards)} shard manifests: {len(links.link_graph.outgoing)} notes, "
+        f"{len(image_jobs)} unique images"
+    )
+    if failed_articles:
+        print(f"{len(failed_articles)} articles failed to convert:")
+        for article_key, error in sorted(failed_articles.items()):
+            print(f"  {article_key}: {error}")
+    # The shards' run manifests (when written on this machine) are folded into
+    # one, so backlink sections and merged images are checked against it.
+    verify.start_run_manifest(config.run_manifest_file, output_directory, config.obsidian_resource_folder)
+    if config.run_manifest_file:
+        verify.adopt_run_manifests(sorted(glob.glob(shard_path(config.run_manifest_file, ("*", "*")))))
+    links.check_links(
+        output_directory,
+        args.link_report or config.link_report_file,
+        args.backlinks or config.backlinks_enabled,
+        False,
+    )
+    await download_images(list(image_jobs.values()))
+    postprocess_images(list(image_jobs.values()))
+    verify.finish_run_manifest()
+    print_connection_summary(close_shared_client())
+    print("WA-Parser is finished; Please validate your results")
+
+
+async def main(args=None):
+    args = args or parse_args()
+    telemetry.start_telemetry(
+        args.telemetry_events or config.telemetry_events_file,
+        args.metrics_file or config.telemetry_metrics_file,
+    )
+    if args.batch:
+        await run_batch(
+            args.batch,
+            write_workers=args.write_workers,
+            use_template_folders=not args.output_root,
+            render_workers=args.jobs,
+            add_backlinks=args.backlinks or None,
+        )
+        print("WA-Parser is finished; Please validate your results")
+        return
+    if args.verify is not None:
+        if verify.verify_run_manifests(args.verify or [config.run_manifest_file]):
+            raise SystemExit(1)
+        return
+
     output_directory = args.output_dir or config.destination_directory
     os.makedirs(output_directory, exist_ok=True)
     os.makedirs(config.obsidian_resource_folder, exist_ok=True)
+    if args.merge_shards:
+        await merge_shards(args, output_directory)
+        return
+
+    streaming = args.streaming or config.streaming_mode
+    shard = parse_shard(args.shard) if args.shard else None
+    synced_files = None
+    if args.sync:
+        synced_files = {os.path.normpath(path) for path in await sync_from_api(config.source_directory)}
 
+    clear_field_fragment_cache()
+    api_breaker = reset_api_breaker()
     local_image_index.clear()
-    local_image_index.update(build_local_image_index(os.path.join(config.source_directory, "images")))
-    set_map_index(build_map_index(os.path.join(config.source_directory, "maps"), local_image_index))
+    local_image_index.update(
+        build_local_image_index(os.path.join(config.source_directory, "images"), compact=streaming)
+    )
+    map_index = build_map_index(os.path.join(config.source_directory, "maps"), local_image_index, compact=streaming)
+    set_map_index(map_index)
 
     all_json_files = list_json_files(config.source_directory)
+    if args.write_title_index:
+        file_ids = {}
+        id_to_title = build_id_title_index(all_json_files, file_ids=file_ids)
+        save_title_index(
+            args.write_title_index, id_to_title, relative_file_ids(file_ids, config.source_directory)
+        )
+        print(f"Wrote the title index for {len(id_to_title)} entities to {args.write_title_index}")
+        return
+
     file_pattern = args.file_regex
     if not file_pattern and args.file_filter:
         file_pattern = re.escape(args.file_filter)
 
     selected_json_files = select_json_files(all_json_files, file_pattern)
+    if synced_files is not None:
+        selected_json_files = [path for path in selected_json_files if os.path.normpath(path) in synced_files]
+        if not selected_json_files:
+            print("Nothing changed since the last sync.")
     if not selected_json_files:
         return
 
-    id_to_title = build_id_title_index(all_json_files)
-    image_jobs = []
+    file_ids = {}
+    if args.title_index:
+        id_to_title, file_ids = load_title_index(args.title_index, compact=streaming)
+    else:
+        id_to_title = build_id_title_index(all_json_files, compact=streaming, file_ids=file_ids if shard else None)
+        file_ids = relative_file_ids(file_ids, config.source_directory)
+    if shard:
+        selected_json_files = select_shard(selected_json_files, file_ids, config.source_directory, shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(selected_json_files)} files")
+
+    history_path = shard_path(config.run_history_file, shard)
+    run_history = load_run_history(history_path)
+    selected_json_files = order_by_estimated_cost(selected_json_files, run_history, config.source_directory)
+    article_timings = {}
+    render_workers = args.jobs or config.render_workers
+    image_jobs = {}
+    note_directory = output_directory
+    staging_directory = None
+    zip_pack = bool(args.pack and is_zip_pack_path(args.pack))
+    if zip_pack and args.resume:
+        print("--resume cannot continue a .zip pack; remove --resume to rebuild the archive.")
+        return
+    if args.pack and not zip_pack:
+        staging_directory = args.pack
+        note_directory = staging_directory
+        os.makedirs(staging_directory, exist_ok=True)
+
+    use_template_folders = not args.output_root
+    checkpoint_path = shard_path(config.checkpoint_file, shard)
+    checkpoint = None
+    if args.resume:
+        checkpoint = load_checkpoint(checkpoint_path, note_directory, use_template_folders)
+        if checkpoint is None:
+            print(f"No usable checkpoint at {checkpoint_path}; converting everything.")
+    if checkpoint is None:
+        checkpoint = new_checkpoint(note_directory, use_template_folders)
+    completed_articles = set(checkpoint["completed"])
+    resumed = bool(completed_articles)
+    failed_articles = {}
+    merge_image_jobs(image_jobs, checkpoint["image_jobs"])
+    checkpoint["completed"] = sorted(completed_articles)
+    checkpoint["image_jobs"] = [list(job) for job in image_jobs.values()]
+    save_checkpoint(checkpoint_path, checkpoint)
+    progress = {"completed": [], "image_jobs": [], "failed": {}}
+    # {json file: article key} of converted articles whose note is still queued.
+    unwritten = {}
+    if completed_articles:
+        selected_json_files = [
+            json_file
+            for json_file in selected_json_files
+            if history_key(json_file, config.source_directory) not in completed_articles
+        ]
+        print(f"Resuming: {len(completed_articles)} articles already converted, {len(selected_json_files)} left.")
+
+    if not zip_pack:
+        verify.start_run_manifest(
+            shard_path(config.run_manifest_file, shard),
+            output_directory,
+            config.obsidian_resource_folder,
+            note_directory,
+            carry_over=bool(file_pattern or resumed or args.sync),
+        )
+
+    # Map tile sets must exist before rendering: the leaflet blocks point at them.
+    await prepare_map_tiles(map_index)
+
+    write_workers = config.write_workers if args.write_workers is None else args.write_workers
+    if zip_pack:
+        writer = ZipNoteWriter(args.pack, output_directory)
+    else:
+        writer = NoteWriter(workers=write_workers, track_written=True) if write_workers > 0 else None
+    from tqdm import tqdm
+
+    links.link_graph.clear()
+    begin_note_claims(all_json_files)
     progress_bar = tqdm(total=len(selected_json_files), unit=" articles")
+    telemetry.stage_started("convert", total=len(selected_json_files))
 
     try:
-        for json_file in selected_json_files:
-            file_image_jobs = process_json_file(
-                json_file,
-                id_to_title,
-                output_directory=output_directory,
-                use_template_folders=not args.output_root,
-            )
+        for json_file, file_image_jobs, seconds, error in convert_json_files(
+            selected_json_files,
+            id_to_title,
+            note_directory,
+            use_template_folders,
+            writer,
+            render_workers,
+        ):
+            article_key = history_key(json_file, config.source_directory)
+            article_timings[article_key] = round(seconds, 4)
+            telemetry.record("convert", error=error)
+            if writer is not None and hasattr(writer, "pending"):
+                telemetry.set_gauge("writer_queue_depth", writer.pending())
+            if error:
+                failed_articles[article_key] = error
+                progress["failed"][article_key] = error
+            elif writer is not None and getattr(writer, "track_written", False) and writer.tracks(json_file):
+                unwritten[json_file] = article_key
+            else:
+                progress["completed"].append(article_key)
             if file_image_jobs:
-                image_jobs.extend(file_image_jobs)
+                merge_image_jobs(image_jobs, file_image_jobs)
+                progress["image_jobs"].extend(list(job) for job in file_image_jobs)
             progress_bar.update(1)
+            if progress_bar.n % config.checkpoint_interval == 0:
+                save_progress(checkpoint_path, progress, writer, unwritten)
     except Exception as e:
         print(f"Failed to convert. Error: {e}")
         raise
     finally:
         progress_bar.close()
+        end_note_claims()
+        if writer is not None:
+            writer.close()
+        telemetry.stage_finished("convert")
+        telemetry.stage_finished("api_lookup")
+        save_run_history(history_path, run_history, article_timings)
+        # After close() every queued note was either written or failed.
+        confirm_written(writer, unwritten, progress)
+        for article_key in unwritten.values():
+            failed_articles[article_key] = "The note could not be written."
+            progress["failed"][article_key] = failed_articles[article_key]
+        save_progress(checkpoint_path, progress, writer, unwritten)
+        # Once per run, so an interrupted run that is resumed still has its notes.
+        verify.save_run_manifest()
+
+    if failed_articles:
+        print(f"{len(failed_articles)} articles failed to convert:")
+        for article_key, error in sorted(failed_articles.items()):
+            print(f"  {article_key}: {error}")
+    print_api_lookup_summary(api_breaker.summary())
 
-    await download_images(image_jobs)
+    # Links can only be validated against the whole vault rendered in one session.
+    if not file_pattern and not resumed and not args.sync and not shard:
+        links.check_links(
+            note_directory,
+            args.link_report or config.link_report_file,
+            args.backlinks or config.backlinks_enabled,
+            zip_pack,
+        )
+
+    if staging_directory:
+        copied, unchanged = sync_staging_directory(staging_directory, output_directory)
+        print(f"Synced {copied} changed notes into {output_directory} ({unchanged} unchanged)")
+
+    if shard:
+        manifest_path = args.shard_manifest or default_manifest_path(shard)
+        write_shard_manifest(manifest_path, shard, note_directory, image_jobs, failed_articles)
+        print(f"Wrote shard manifest {manifest_path}; run --merge-shards with every manifest to download images.")
+    else:
+        await download_images(list(image_jobs.values()))
+        postprocess_images(list(image_jobs.values()))
+    verify.finish_run_manifest()
+    print_connection_summary(close_shared_client())
+    prune_json_cache()
+    if not failed_articles:
+        clear_checkpoint(checkpoint_path)
+    if streaming:
+        peak_memory = peak_memory_mb()
+        if peak_memory is not None:
+            print(f"Peak memory: {peak_memory:.1f} MB")
     print("WA-Parser is finished; Please validate your results")
 
 
 def run():
-    asyncio.run(main())
+    # Parse before importing asyncio so --help and argument errors stay cheap.
+    args = parse_args()
+    import asyncio
+
+    try:
+        asyncio.run(main(args))
+    finally:
+        telemetry.stop_telemetry()
@@ -0,0 +1,162 @@
+import sys
+import uuid
+
+
+class SlotRecord:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def keys(self):
+        return self.__slots__
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={getattr(self, key)!r}" for key in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class ImageRecord(SlotRecord):
+    __slots__ = ("id", "title", "url", "filename")
+
+    def __init__(self, id, title, url, filename):
+        self.id = sys.intern(id)
+        self.title = sys.intern(title)
+        self.url = url
+        self.filename = sys.intern(filename)
+
+
+class MapRecord(SlotRecord):
+    __slots__ = ("id", "title", "url", "folder_path", "title_norm", "image", "tiles")
+
+    def __init__(self, id, title, url, folder_path, title_norm, image, tiles=None):
+        self.id = id
+        self.title = sys.intern(title)
+        self.url = url
+        self.folder_path = folder_path
+        self.title_norm = sys.intern(title_norm)
+        self.image = image
+        self.tiles = tiles
+
+
+def compact_image_metadata(metadata):
+    if not metadata:
+        return None
+    return ImageRecord(metadata["id"], metadata["title"], metadata["url"], metadata["filename"])
+
+
+def compact_map_record(map_record):
+    if not map_record:
+        return None
+    return MapRecord(
+        map_record["id"],
+        map_record["title"],
+        map_record["url"],
+        map_record["folder_path"],
+        map_record["title_norm"],
+        map_record["image"],
+        map_record.get("tiles"),
+    )
+
+
+class CompactTitleIndex:
+    # UUID article ids are packed as 16-byte keys into one sorted bytes blob and
+    # looked up by binary search; anything else falls back to a plain dict.
+    KEY_SIZE = 16
+
+    def __init__(self):
+        self._pending = []
+        self._keys = b""
+        self._titles = []
+        self._extra = {}
+
+    def add(self, article_id, title):
+        title = sys.intern(str(title))
+        key = self._pack(article_id)
+        if key is None:
+            self._extra[article_id] = title
+        else:
+            self._pending.append((key, title))
+
+    def freeze(self):
+        if not self._pending:
+            return self
+        merged = dict(zip(self._iter_keys(), self._titles))
+        merged.update(self._pending)
+        ordered = sorted(merged.items())
+        self._keys = b"".join(key for key, _ in ordered)
+        self._titles = [title for _, title in ordered]
+        self._pending = []
+        return self
+
+    def get(self, article_id, default=None):
+        if self._pending:
+            self.freeze()
+        key = self._pack(article_id)
+        if key is None:
+            return self._extra.get(article_id, default)
+
+        low, high = 0, len(self._titles)
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * self.KEY_SIZE
+            candidate = self._keys[offset:offset + self.KEY_SIZE]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return self._titles[middle]
+        return default
+
+    def __getitem__(self, article_id):
+        missing = object()
+        title = self.get(article_id, missing)
+        if title is missing:
+            raise KeyError(article_id)
+        return title
+
+    def __contains__(self, article_id):
+        return self.get(article_id) is not None
+
+    def __len__(self):
+        self.freeze()
+        return len(self._titles) + len(self._extra)
+
+    def _iter_keys(self):
+        for offset in range(0, len(self._keys), self.KEY_SIZE):
+            yield self._keys[offset:offset + self.KEY_SIZE]
+
+    @staticmethod
+    def _pack(article_id):
+        if not isinstance(article_id, str) or len(article_id) != 36:
+            return None
+        try:
+            parsed = uuid.UUID(article_id)
+        except ValueError:
+            return None
+        # Only exact canonical spellings round-trip; keep anything else verbatim.
+        if str(parsed) != article_id:
+            return None
+        return parsed.bytes
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux.
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
@@ -0,0 +1,187 @@
+import threading
+import time
+
+from . import config
+
+
+class AdaptiveLimiter:
+    # AIMD concurrency limit for downloads. Every window of roughly `limit`
+    # completed requests the limit grows by one while latency stays near the
+    # best seen and throughput keeps improving; 429s, 5xx and timeouts halve it
+    # (at most once per window), and rising latency trims it.
+    def __init__(self, initial, minimum, maximum, latency_tolerance=2.0):
+        import asyncio
+
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.completed = 0
+        self.failures = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._condition = asyncio.Condition()
+        self._paused_until = 0.0
+        self._baseline_latency = None
+        self._latency_ewma = None
+        self._window_count = 0
+        self._window_bytes = 0
+        self._window_started = self.started
+        self._window_congested = False
+        self._previous_throughput = None
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    @property
+    def adaptive(self):
+        return self.minimum != self.maximum
+
+    async def __aenter__(self):
+        async with self._condition:
+            while self.in_flight >= self.current:
+                await self._condition.wait()
+            self.in_flight += 1
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            import asyncio
+
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record_success(self, latency, nbytes):
+        self.completed += 1
+        self.bytes += nbytes
+        self._window_count += 1
+        self._window_bytes += nbytes
+        if self._baseline_latency is None or latency < self._baseline_latency:
+            self._baseline_latency = latency
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+        if self._window_count >= max(1, self.current):
+            self._close_window()
+
+    def record_congestion(self, retry_after=None):
+        self.failures += 1
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        if not self._window_congested:
+            self._window_congested = True
+            self._set_limit(self.limit / 2)
+
+    def _close_window(self):
+        elapsed = max(1e-6, time.monotonic() - self._window_started)
+        throughput = self._window_bytes / elapsed
+        slow = (
+            self._baseline_latency is not None
+            and self._latency_ewma > self._baseline_latency * self.latency_tolerance
+        )
+        stalled = self._previous_throughput is not None and throughput < self._previous_throughput * 0.9
+        if slow:
+            self._set_limit(self.limit * 0.8)
+        elif not self._window_congested and not stalled:
+            self._set_limit(self.limit + 1)
+
+        self._previous_throughput = throughput
+        self._window_count = 0
+        self._window_bytes = 0
+        self._window_started = time.monotonic()
+        self._window_congested = False
+
+    def _set_limit(self, limit):
+        self.limit = float(min(self.maximum, max(self.minimum, limit)))
+        self.peak_limit = max(self.peak_limit, self.limit)
+
+    def summary(self):
+        elapsed = max(1e-6, time.monotonic() - self.started)
+        return {
+            "concurrency": self.current,
+            "peak_concurrency": int(self.peak_limit),
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "completed": self.completed,
+            "congestion_events": self.failures,
+            "bytes": self.bytes,
+            "bytes_per_second": self.bytes / elapsed,
+        }
+
+
+class CircuitBreaker:
+    # Guards the image API fallback. Opens after worldanvil_api_failure_threshold
+    # lookups in a row got no answer from the API, or once
+    # worldanvil_api_time_budget_seconds have been spent on lookups; after that
+    # every lookup is skipped and counted. Counters live in one flat array so
+    # render worker processes can share a single breaker (see shared_state).
+    CONSECUTIVE_FAILURES, ELAPSED, OPEN, LOOKUPS, FAILURES, SKIPPED = range(6)
+    OPENED_BY_FAILURES = 1
+    OPENED_BY_BUDGET = 2
+
+    def __init__(self, state=None):
+        self._state = state if state is not None else [0.0] * 6
+        self._lock = state.get_lock() if state is not None else threading.Lock()
+
+    def shared_state(self):
+        # Moves the counters into shared memory (once) and returns them for
+        # passing to worker processes.
+        import multiprocessing
+
+        with self._lock:
+            if isinstance(self._state, list):
+                shared = multiprocessing.Array("d", self._state)
+                self._state, self._lock = shared, shared.get_lock()
+        return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state[self.OPEN]:
+                self._state[self.SKIPPED] += 1
+                return False
+            return True
+
+    def request_timeout(self, timeout):
+        # Never let a single request run past the remaining budget.
+        budget = config.worldanvil_api_time_budget_seconds
+        if not budget:
+            return timeout
+        with self._lock:
+            return min(timeout, budget - self._state[self.ELAPSED])
+
+    def record(self, seconds, failed):
+        threshold = config.worldanvil_api_failure_threshold
+        budget = config.worldanvil_api_time_budget_seconds
+        with self._lock:
+            state = self._state
+            state[self.LOOKUPS] += 1
+            state[self.ELAPSED] += seconds
+            if failed:
+                state[self.FAILURES] += 1
+                state[self.CONSECUTIVE_FAILURES] += 1
+            else:
+                state[self.CONSECUTIVE_FAILURES] = 0
+            if state[self.OPEN]:
+                return
+            if threshold and state[self.CONSECUTIVE_FAILURES] >= threshold:
+                state[self.OPEN] = self.OPENED_BY_FAILURES
+            elif budget and state[self.ELAPSED] >= budget:
+                state[self.OPEN] = self.OPENED_BY_BUDGET
+
+    def summary(self):
+        with self._lock:
+            state = list(self._state)
+        return {
+            "lookups": int(state[self.LOOKUPS]),
+            "failures": int(state[self.FAILURES]),
+            "skipped": int(state[self.SKIPPED]),
+            "seconds": state[self.ELAPSED],
+            "opened_by": {self.OPENED_BY_FAILURES: "failures", self.OPENED_BY_BUDGET: "budget"}.get(int(state[self.OPEN])),
+        }
@@ -62,3 +62,98 @@ handled_fields = {
     "creationDate", "publicationDate",
     "sidepanelcontenttop", "sidepanelcontent", "sidebarcontent", "sidebarcontentbottom", "sidepanelcontentbottom",
 }
+
+# Bounded-memory mode for very large exports (same as --streaming).
+streaming_mode = False
+
+# Optional post-download image processing (requires Pillow): downscale to
+# image_max_dimension and transcode to "webp", "jpeg" or "keep" the format.
+image_postprocess_enabled = False
+image_max_dimension = 2048
+image_output_format = "webp"
+image_output_quality = 82
+image_keep_original = False
+image_postprocess_workers = None
+image_postprocess_cache_file = ".wa-parser-image-cache.json"
+# Adapt download concurrency at runtime (AIMD) between these bounds, starting
+# from download_concurrency. Retries apply to 429, 5xx and timeouts.
+download_concurrency_adaptive = True
+download_concurrency_min = 2
+download_concurrency_max = 64
+download_latency_tolerance = 2.0
+download_retries = 2
+# Downloaded image sizes, remembered so later runs fetch small images first.
+image_size_history_file = ".wa-parser-image-sizes.json"
+# Image binaries already on disk (the export's images folder plus these
+# directories) are placed into obsidian_resource_folder instead of being
+# downloaded: "hardlink" links when possible, "copy" always makes a copy (a
+# reflink or in-kernel copy where the filesystem supports it).
+local_image_import_enabled = True
+local_image_directories = []
+local_image_link_mode = "hardlink"
+# One pooled HTTP client per run serves API lookups and downloads. HTTP/2 is
+# used when enabled and the h2 package is installed.
+http2_enabled = True
+http_max_connections = 64
+http_max_keepalive_connections = 32
+http_keepalive_expiry_seconds = 30.0
+
+# Render worker processes (1 renders in-process) and the per-article timing
+# history used to schedule the longest articles first.
+render_workers = 1
+run_history_file = ".wa-parser-history.json"
+# Progress checkpoint used by --resume, saved every checkpoint_interval articles.
+checkpoint_file = ".wa-parser-checkpoint.json"
+checkpoint_interval = 100
+# Formatted short field values (infobox, sidebar, card links) kept in an LRU
+# cache keyed by the raw text; 0 disables it.
+field_value_cache_size = 4096
+# Articles whose rendering takes longer than this many seconds are reported
+# with their size and BBCode tag counts. None disables the check.
+article_time_budget_seconds = 2.0
+# Opt-in cache of decoded export files in pickle form, keyed by path, mtime and
+# size, and trimmed to json_cache_max_mb (least recently used first) after each
+# run. Pickles can run code when loaded: only use a directory you trust.
+json_cache_directory = None
+json_cache_max_mb = 512
+# Manifest of every note and image a run wrote (sizes and sha1), checked by
+# --verify; None disables it. Hashing threads for --verify (None: 4 per CPU).
+run_manifest_file = ".wa-parser-run-manifest.json"
+verify_workers = None
+# Optional run telemetry: JSON-lines events and a Prometheus textfile.
+telemetry_events_file = None
+telemetry_metrics_file = None
+telemetry_interval_seconds = 5.0
+# Post-run link validation: optional broken-link report path and backlink sections.
+link_report_file = None
+backlinks_enabled = False
+# Background markdown writers; 0 writes each note synchronously.
+write_workers = 4
+write_queue_size = 64
+
+# Optional tile pyramids for map base images (requires Pillow): the leaflet
+# block then loads tiles instead of the full image. Tile sets are cached by
+# image content hash under leaflet_tiles_directory (default: a map-tiles folder
+# in obsidian_resource_folder) and served from leaflet_tile_url_base (default:
+# a file:// URL of that folder).
+leaflet_tiles_enabled = False
+leaflet_tile_size = 256
+leaflet_tile_format = "png"
+leaflet_tile_quality = 85
+leaflet_tile_workers = None
+leaflet_tiles_directory = None
+leaflet_tile_url_base = None
+
+# Stop API lookups for the rest of the run after this many lookups in a row
+# get no answer, or once this many seconds have gone into lookups; skipped
+# images get the missing-image placeholder. 0 or None disables either limit.
+worldanvil_api_failure_threshold = 5
+worldanvil_api_time_budget_seconds = 300.0
+
+# Direct API sync (--sync): mirror the world into source_directory, fetching
+# only entities whose updateDate changed since the last sync.
+worldanvil_api_base_url = "https://www.worldanvil.com/api/external/boromir"
+worldanvil_application_key = ""
+api_sync_page_size = 50
+api_sync_concurrency = 8
+api_sync_state_file = ".wa-parser-sync-state.json"
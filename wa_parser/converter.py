@@ -0,0 +1,247 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from . import image_pipeline, links, maps, template_engine
+from .fields import build_id_title_index
+from .image_pipeline import build_local_image_index, download_images, merge_image_jobs
+from .concurrency import CircuitBreaker
+from .http_client import SharedHttpClient
+from .image_processing import postprocess_images
+from .json_cache import load_json_file
+from .links import LinkGraph
+from .map_tiles import prepare_map_tiles
+from .maps import build_map_index
+from .processor import begin_note_claims, end_note_claims, render_article, write_rendered_note
+from .render_pool import describe_error, render_with_pool
+from .settings import Settings, apply_config
+from .utils import list_json_files
+from .writer import NoteWriter, note_text
+
+
+# The rendering functions read module-level state (config and the globals that
+# activated() swaps), so only one converter may have it installed at a time,
+# whichever thread it runs on.
+_activation_lock = threading.RLock()
+
+
+class Converter:
+    # Owns everything a conversion needs (settings, indexes, API cache and
+    # circuit breaker, link graph, template environment, HTTP client) so a long-lived process can run
+    # many conversions without rebuilding any of it. The rendering functions
+    # read module-level state, so each call installs this converter's state for
+    # its duration and restores the previous state afterwards.
+    def __init__(
+        self,
+        settings=None,
+        template_environment=None,
+        api_client=None,
+        api_image_cache=None,
+        api_breaker=None,
+        api_client_factory=None,
+    ):
+        self.settings = settings or Settings()
+        self.image_index = None
+        self.map_index = None
+        self.id_to_title = None
+        self.json_files = None
+        self.api_image_cache = {} if api_image_cache is None else api_image_cache
+        self.api_breaker = CircuitBreaker() if api_breaker is None else api_breaker
+        self.link_graph = LinkGraph()
+        self.template_environment = template_environment
+        self.api_client = api_client
+        # Supplies a client owned by the caller the first time one is needed.
+        self.api_client_factory = api_client_factory
+        self._owns_api_client = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self):
+        if self._owns_api_client and self.api_client is not None:
+            self.api_client.close()
+        self.api_client = None
+
+    @property
+    def indexes_loaded(self):
+        return self.id_to_title is not None
+
+    def load_indexes(self, force=False):
+        if self.indexes_loaded and not force:
+            return
+        with self.activated():
+            source_directory = self.settings.source_directory
+            compact = self.settings.streaming_mode
+            self.image_index = build_local_image_index(os.path.join(source_directory, "images"), compact=compact)
+            self.map_index = build_map_index(os.path.join(source_directory, "maps"), self.image_index, compact=compact)
+            self.json_files = list_json_files(source_directory)
+            self.id_to_title = build_id_title_index(self.json_files, compact=compact)
+
+    def convert_article(self, article, output_directory=None, use_template_folders=True):
+        # Accepts a JSON path or an already decoded article; returns
+        # (markdown_filename, markdown_text, image_jobs) without touching disk.
+        self.load_indexes()
+        output_directory = output_directory or self.settings.destination_directory
+        with self.activated():
+            if isinstance(article, dict):
+                data, filename = article, f"{article.get('title') or 'untitled'}.json"
+            else:
+                data, filename = load_json_file(article), os.path.basename(article)
+            markdown_filename, markdown_text, image_jobs, article_links = render_article(
+                data, filename, self.id_to_title, output_directory, use_template_folders
+            )
+        if markdown_filename:
+            self.link_graph.add_note(markdown_filename, article_links)
+            markdown_text = note_text(markdown_text)
+        return markdown_filename, markdown_text, image_jobs
+
+    def convert_export(
+        self, output_directory=None, use_template_folders=True, write_workers=None, writer=None, render_workers=None
+    ):
+        # A caller-supplied writer is shared and left open; otherwise one is
+        # created for this export and closed when it is done. With more than
+        # one render worker the articles render in a process pool. Notes the
+        # writer could not write are reported in failures, as in the CLI.
+        self.load_indexes()
+        output_directory = output_directory or self.settings.destination_directory
+        write_workers = self.settings.write_workers if write_workers is None else write_workers
+        render_workers = render_workers or self.settings.render_workers
+        image_jobs = {}
+        failures = {}
+        self.link_graph.clear()
+        owns_writer = writer is None
+        if owns_writer and write_workers > 0:
+            writer = NoteWriter(workers=write_workers, track_written=True)
+        # JSON files whose note is queued on a writer that reports outcomes.
+        unwritten = set()
+        try:
+            with self.activated():
+                begin_note_claims(self.json_files)
+                try:
+                    rendered = self.render_articles(output_directory, use_template_folders, render_workers)
+                    for json_file, markdown_filename, markdown_text, file_image_jobs, article_links, error in rendered:
+                        if error:
+                            failures[json_file] = error
+                            continue
+                        try:
+                            write_rendered_note(
+                                markdown_filename, markdown_text, writer, article_links, source_file=json_file
+                            )
+                        except OSError as exc:
+                            failures[json_file] = describe_error(exc)
+                            continue
+                        if getattr(writer, "track_written", False) and writer.tracks(json_file):
+                            unwritten.add(json_file)
+                        merge_image_jobs(image_jobs, file_image_jobs)
+                finally:
+                    end_note_claims()
+        finally:
+            if owns_writer and writer is not None:
+                writer.close()
+        if unwritten:
+            if not owns_writer:
+                writer.flush()
+            unwritten.difference_update(writer.take_written())
+            for json_file in unwritten:
+                failures[json_file] = "The note could not be written."
+        return list(image_jobs.values()), failures
+
+    def render_articles(self, output_directory, use_template_folders, render_workers):
+        if render_workers <= 1:
+            yield from self.render_serially(output_directory, use_template_folders)
+            return
+        for json_file, markdown_filename, markdown_text, file_image_jobs, article_links, _, error in render_with_pool(
+            self.json_files, self.id_to_title, output_directory, use_template_folders, render_workers
+        ):
+            yield json_file, markdown_filename, markdown_text, file_image_jobs, article_links, error
+
+    def render_serially(self, output_directory, use_template_folders):
+        for json_file in self.json_files:
+            try:
+                data = load_json_file(json_file)
+                markdown_filename, markdown_text, file_image_jobs, article_links = render_article(
+                    data, os.path.basename(json_file), self.id_to_title, output_directory, use_template_folders
+                )
+            except Exception as exc:
+                yield json_file, None, None, [], [], describe_error(exc)
+                continue
+            yield json_file, markdown_filename, markdown_text, file_image_jobs, article_links, None
+
+    def check_links(self, output_directory=None, report_path=None, add_backlinks=None):
+        # Call once the notes are on disk (after the writer is flushed) when
+        # backlink sections are added.
+        with self.activated():
+            links.check_links(
+                output_directory or self.settings.destination_directory,
+                report_path or self.settings.link_report_file,
+                self.settings.backlinks_enabled if add_backlinks is None else add_backlinks,
+            )
+
+    async def prepare_map_tiles(self, client=None):
+        # Optional (leaflet_tiles_enabled): call before converting so map notes
+        # get tile-pyramid leaflet blocks.
+        self.load_indexes()
+        with self.activated():
+            # Without a client, one is built only if a base image is downloaded.
+            os.makedirs(self.settings.obsidian_resource_folder, exist_ok=True)
+            await prepare_map_tiles(self.map_index, client=client)
+
+    def ensure_http_client(self):
+        # One pooled client serves this converter's API lookups and downloads.
+        if self.api_client is None and self.api_client_factory is not None:
+            self.api_client = self.api_client_factory()
+        elif self.api_client is None:
+            self.api_client = SharedHttpClient(timeout=self.settings.download_timeout_seconds)
+            self._owns_api_client = True
+        return self.api_client
+
+    async def download_images(self, image_jobs, client=None):
+        with self.activated():
+            os.makedirs(self.settings.obsidian_resource_folder, exist_ok=True)
+            await download_images(image_jobs, client=client)
+            postprocess_images(image_jobs)
+
+    @contextmanager
+    def activated(self):
+        with _activation_lock:
+            if self.template_environment is None and self.settings.its_theme_support:
+                self.template_environment = template_engine.build_template_environment(
+                    self.settings.templates_directory
+                )
+            previous_config = apply_config(self.settings.as_dict())
+            previous_state = (
+                image_pipeline.local_image_index,
+                image_pipeline.api_image_cache,
+                image_pipeline.api_client,
+                image_pipeline.api_client_factory,
+                image_pipeline.api_breaker,
+                maps.map_index,
+                template_engine.template_environment,
+                links.link_graph,
+            )
+            image_pipeline.local_image_index = self.image_index if self.image_index is not None else {}
+            image_pipeline.api_image_cache = self.api_image_cache
+            image_pipeline.api_client = self.api_client
+            # The HTTP client is only built when an API lookup actually runs.
+            image_pipeline.api_client_factory = self.ensure_http_client
+            image_pipeline.api_breaker = self.api_breaker
+            maps.set_map_index(self.map_index)
+            template_engine.set_template_environment(self.template_environment)
+            links.link_graph = self.link_graph
+            try:
+                yield self
+            finally:
+                (
+                    image_pipeline.local_image_index,
+                    image_pipeline.api_image_cache,
+                    image_pipeline.api_client,
+                    image_pipeline.api_client_factory,
+                    image_pipeline.api_breaker,
+                    maps.map_index,
+                    template_engine.template_environment,
+                    links.link_graph,
+                ) = previous_state
+                apply_config(previous_config)
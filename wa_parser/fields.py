@@ -1,8 +1,12 @@
-import json
 import re
+from collections import OrderedDict
 
-from . import config
+from . import config, image_pipeline, links
+from .compact import CompactTitleIndex
 from .image_pipeline import build_image_metadata, register_image_job, render_portrait_embed
+from .image_processing import vault_image_filename
+from .json_cache import load_json_file
+from .links import register_link
 from .text_formatting import extract_spotify_embeds_and_text, format_content
 
 
@@ -55,6 +59,7 @@ def collect_relations(data):
                         if not title:
                             continue
                         if item.get("relationshipType") == "article":
+                            register_link(title)
                             content += f"[[{title}]]\n"
                         else:
                             content += f"{title}\n"
@@ -126,20 +131,27 @@ def type_folder_name(type_title):
     return folder_name or None
 
 
-def build_id_title_index(json_files):
-    id_to_title = {}
+def build_id_title_index(json_files, compact=False, file_ids=None):
+    # file_ids, when given, is filled with json_file -> entity id for sharding.
+    id_to_title = CompactTitleIndex() if compact else {}
     for json_file in json_files:
         try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = load_json_file(json_file)
             if isinstance(data, dict):
                 article_id = data.get("id")
+                if file_ids is not None and article_id:
+                    file_ids[json_file] = str(article_id)
                 title = note_link_title(data) or data.get("title")
                 if article_id and title:
-                    id_to_title[article_id] = title
+                    if compact:
+                        id_to_title.add(article_id, title)
+                    else:
+                        id_to_title[article_id] = title
         except Exception as exc:
             if config.DEBUG:
                 print(f"Unable to index {json_file}: {exc}")
+    if compact:
+        id_to_title.freeze()
     return id_to_title
 
 
@@ -152,9 +164,65 @@ def resolve_link_title(reference, id_to_title):
     return None
 
 
+field_fragment_cache = OrderedDict()
+field_fragment_cache_owner = None
+
+
+def clear_field_fragment_cache():
+    global field_fragment_cache_owner
+    field_fragment_cache.clear()
+    field_fragment_cache_owner = None
+
+
+def is_plain_field_text(value):
+    # Nothing in format_content touches text without these markers: every tag,
+    # mention and image embed starts with "[" and the only other rewrites are
+    # whitespace runs, tabs and "\r\n\r".
+    return "[" not in value and "\t" not in value and "  " not in value and "\r\n\r" not in value
+
+
+def format_field_text(value):
+    global field_fragment_cache_owner
+    if is_plain_field_text(value):
+        return value
+    if config.field_value_cache_size <= 0:
+        return format_content({"text": value})
+
+    # Image resolution depends on the installed indexes; a Converter swapping
+    # them in invalidates everything cached under the previous ones.
+    owner = (image_pipeline.local_image_index, image_pipeline.api_image_cache)
+    if field_fragment_cache_owner is None or any(a is not b for a, b in zip(owner, field_fragment_cache_owner)):
+        field_fragment_cache.clear()
+        field_fragment_cache_owner = owner
+
+    cached = field_fragment_cache.get(value)
+    if cached is None:
+        outer_jobs, outer_links = image_pipeline.active_image_jobs, links.active_links
+        image_pipeline.active_image_jobs, links.active_links = [], []
+        try:
+            text = format_content({"text": value})
+            cached = (text, tuple(image_pipeline.active_image_jobs), tuple(links.active_links))
+        finally:
+            image_pipeline.active_image_jobs, links.active_links = outer_jobs, outer_links
+        field_fragment_cache[value] = cached
+        if len(field_fragment_cache) > config.field_value_cache_size:
+            field_fragment_cache.popitem(last=False)
+    else:
+        field_fragment_cache.move_to_end(value)
+
+    # Replay the registrations so a cached fragment still downloads its images
+    # and contributes its links to this note.
+    text, image_jobs, note_links = cached
+    if image_pipeline.active_image_jobs is not None:
+        image_pipeline.active_image_jobs.extend(image_jobs)
+    if links.active_links is not None:
+        links.active_links.extend(note_links)
+    return text
+
+
 def format_field_value(value):
     if isinstance(value, str):
-        return format_content({"text": value})
+        return format_field_text(value)
     if isinstance(value, bool):
         return "true" if value else "false"
     if isinstance(value, (int, float)):
@@ -162,6 +230,7 @@ def format_field_value(value):
     if isinstance(value, dict):
         link_title = note_link_title(value)
         if link_title:
+            register_link(link_title)
             return f"[[{link_title}]]"
         if not is_empty_value(value.get("date")):
             return str(value.get("date"))
@@ -189,19 +258,23 @@ def collect_navigation_lines(data, id_to_title):
     navigation = []
     parent_title = resolve_link_title(data.get("articleParent"), id_to_title)
     if parent_title:
+        register_link(parent_title)
         navigation.append(f"- Parent: [[{parent_title}]]")
 
     if not parent_title:
         alt_parent_title = resolve_link_title(data.get("parent"), id_to_title)
         if alt_parent_title:
+            register_link(alt_parent_title)
             navigation.append(f"- Parent: [[{alt_parent_title}]]")
 
     previous_title = resolve_link_title(data.get("articlePrevious"), id_to_title)
     if previous_title:
+        register_link(previous_title)
         navigation.append(f"- Previous: [[{previous_title}]]")
 
     next_title = resolve_link_title(data.get("articleNext"), id_to_title)
     if next_title:
+        register_link(next_title)
         navigation.append(f"- Next: [[{next_title}]]")
     return navigation
 
@@ -233,8 +306,10 @@ def collect_card_link_sections(data):
             if isinstance(item, dict):
                 title = note_link_title(item) or item.get("title")
                 if isinstance(title, str) and title.strip():
+                    register_link(title.strip())
                     links.append(f"[[{title.strip()}]]")
             elif isinstance(item, str) and item.strip():
+                register_link(item.strip())
                 links.append(f"[[{item.strip()}]]")
 
         if links:
@@ -296,8 +371,8 @@ def collect_sidebar_sections(data, template_name=None):
     if resolved_template == "person":
         portrait_metadata = build_image_metadata(data.get("portrait") or {})
         if portrait_metadata:
-            register_image_job(portrait_metadata["url"], portrait_metadata["filename"])
-            top_values.insert(0, render_portrait_embed(portrait_metadata["filename"]))
+            register_image_job(portrait_metadata["url"], portrait_metadata["filename"], "portrait")
+            top_values.insert(0, render_portrait_embed(vault_image_filename(portrait_metadata["filename"])))
 
     def render_sidebar_values(values):
         rendered_blocks = []
@@ -0,0 +1,155 @@
+import atexit
+import threading
+from importlib.util import find_spec
+
+from . import config, telemetry
+
+
+class ConnectionStats:
+    # Counts requests per pooled connection. httpcore hands back the same
+    # network_stream object for every response on one connection, so distinct
+    # streams are the connections that were actually opened.
+    def __init__(self):
+        self.requests = 0
+        self.http_versions = {}
+        self._streams = set()
+
+    def record(self, response):
+        self.requests += 1
+        version = response.extensions.get("http_version", b"")
+        version = version.decode("ascii", "replace") if isinstance(version, bytes) else str(version)
+        self.http_versions[version] = self.http_versions.get(version, 0) + 1
+        stream = response.extensions.get("network_stream")
+        if stream is not None:
+            self._streams.add(stream)
+        telemetry.set_gauge("http_connections_opened", len(self._streams))
+
+    @property
+    def connections(self):
+        return len(self._streams)
+
+    def summary(self):
+        reused = max(0, self.requests - self.connections)
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused_requests": reused,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            "http_versions": dict(self.http_versions),
+        }
+
+
+class SharedHttpClient:
+    # One pooled httpx.AsyncClient for a whole run, owned by a background event
+    # loop thread. Rendering is synchronous and calls get() from outside any
+    # loop. The download stage hands its coroutine to run(), so the downloads
+    # share the same connections as the API lookups.
+    def __init__(
+        self,
+        timeout=None,
+        http2=None,
+        max_connections=None,
+        max_keepalive_connections=None,
+        keepalive_expiry=None,
+    ):
+        import asyncio
+
+        import httpx
+
+        if http2 is None:
+            http2 = config.http2_enabled and find_spec("h2") is not None
+        self.http2 = http2
+        self.stats = ConnectionStats()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="wa-http", daemon=True)
+        self._thread.start()
+        self._closed = False
+        limits = httpx.Limits(
+            max_connections=max_connections or config.http_max_connections,
+            max_keepalive_connections=max_keepalive_connections or config.http_max_keepalive_connections,
+            keepalive_expiry=config.http_keepalive_expiry_seconds if keepalive_expiry is None else keepalive_expiry,
+        )
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(config.download_timeout_seconds if timeout is None else timeout),
+            limits=limits,
+            http2=http2,
+            follow_redirects=True,
+            event_hooks={"response": [self._record_response]},
+        )
+
+    async def _record_response(self, response):
+        self.stats.record(response)
+
+    def submit(self, coroutine):
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def get(self, url, **kwargs):
+        return self.submit(self.client.get(url, **kwargs)).result()
+
+    async def run(self, coroutine):
+        # Runs coroutine on the client's loop and awaits it from the caller's loop.
+        import asyncio
+
+        return await asyncio.wrap_future(self.submit(coroutine))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.submit(self.client.aclose()).result()
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    global shared_client
+    with _shared_client_lock:
+        if shared_client is None:
+            shared_client = SharedHttpClient()
+            atexit.register(close_shared_client)
+        return shared_client
+
+
+def forget_shared_client():
+    # For forked processes: the inherited client's event-loop thread does not
+    # exist in the child, so the client is dropped without being closed and the
+    # next get_shared_client() builds a fresh one.
+    global shared_client, _shared_client_lock
+    shared_client = None
+    _shared_client_lock = threading.Lock()
+
+
+def close_shared_client():
+    # Returns the connection summary of the client that was closed, if any.
+    global shared_client
+    with _shared_client_lock:
+        client, shared_client = shared_client, None
+    if client is None:
+        return None
+    client.close()
+    return client.stats.summary()
+
+
+def print_connection_summary(summary):
+    if not summary or not summary["requests"]:
+        return
+    versions = ", ".join(f"{version} {count}" for version, count in sorted(summary["http_versions"].items()))
+    print(
+        f"HTTP: {summary['requests']} requests over {summary['connections']} connections "
+        f"({summary['reuse_ratio']:.0%} reused; {versions})"
+    )
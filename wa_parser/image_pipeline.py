@@ -1,16 +1,38 @@
-import asyncio
 import json
 import os
+import time
 
-import httpx
+from . import config, telemetry, verify
+from .compact import compact_image_metadata
+from .concurrency import AdaptiveLimiter, CircuitBreaker
+from .http_client import SharedHttpClient, get_shared_client
+from .image_processing import vault_image_filename
+from .json_cache import load_json_file
+from .local_images import import_local_images
+from .utils import normalize_image_filename, write_json_atomically
 
-from . import config
-from .utils import normalize_image_filename
 
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Download order: what makes a note look finished (cover banners, portraits,
+# map base images) comes before inline images.
+IMAGE_JOB_PRIORITY = {"cover": 0, "portrait": 0, "map": 0, "inline": 1}
 
 local_image_index = {}
 api_image_cache = {}
 active_image_jobs = None
+# HTTP client for API lookups and downloads. A Converter installs its own here;
+# otherwise the run's shared pooled client is used.
+api_client = None
+# Builds api_client on the first lookup when set (Converter owns its client).
+api_client_factory = None
+# Failure and time-budget guard for API lookups, one per run.
+api_breaker = CircuitBreaker()
+
+
+def reset_api_breaker():
+    global api_breaker
+    api_breaker = CircuitBreaker()
+    return api_breaker
 
 
 def begin_image_job_collection():
@@ -25,12 +47,12 @@ def end_image_job_collection():
     return jobs
 
 
-def register_image_job(url, filename):
+def register_image_job(url, filename, kind="inline"):
     if active_image_jobs is None or not url or not filename:
         return
     normalized_filename = normalize_image_filename(filename)
     if normalized_filename:
-        active_image_jobs.append((url, normalized_filename))
+        active_image_jobs.append((url, normalized_filename, kind))
 
 
 def build_image_metadata(image_record):
@@ -55,7 +77,7 @@ def build_image_metadata(image_record):
     }
 
 
-def build_local_image_index(images_directory):
+def build_local_image_index(images_directory, compact=False):
     index = {}
     if not os.path.isdir(images_directory):
         return index
@@ -66,14 +88,15 @@ def build_local_image_index(images_directory):
                 continue
             file_path = os.path.join(root, filename)
             try:
-                with open(file_path, "r", encoding="utf-8") as image_file:
-                    image_data = json.load(image_file)
+                image_data = load_json_file(file_path)
             except Exception as exc:
                 if config.DEBUG:
                     print(f"Unable to read image metadata {file_path}: {exc}")
                 continue
 
             image_metadata = build_image_metadata(image_data)
+            if compact:
+                image_metadata = compact_image_metadata(image_metadata)
             if image_metadata:
                 index[image_metadata["id"]] = image_metadata
     return index
@@ -100,6 +123,13 @@ def parse_api_image_payload(payload, expected_image_id):
     return None
 
 
+def lookup_client():
+    global api_client
+    if api_client is None and api_client_factory is not None:
+        api_client = api_client_factory()
+    return api_client or get_shared_client()
+
+
 def resolve_image_via_api(image_id):
     if not config.inline_image_api_fallback_enabled:
         return None
@@ -111,6 +141,9 @@ def resolve_image_via_api(image_id):
     image_id = str(image_id)
     if image_id in api_image_cache:
         return api_image_cache[image_id]
+    if not api_breaker.allow():
+        telemetry.record("api_lookup", skipped=True)
+        return None
 
     request_url = config.worldanvil_image_api_url_template.format(image_id=image_id)
     headers = {config.worldanvil_api_auth_header: config.worldanvil_api_key}
@@ -119,14 +152,22 @@ def resolve_image_via_api(image_id):
         params["world"] = config.worldanvil_world_id
 
     metadata = None
+    answered = False
+    last_error = None
+    started = time.monotonic()
+    telemetry.add_gauge("api_lookups_in_flight", 1)
     for _ in range(max(1, config.worldanvil_api_retries)):
+        timeout = api_breaker.request_timeout(config.worldanvil_api_timeout_seconds)
+        if timeout <= 0:
+            break
         try:
-            response = httpx.get(
+            response = lookup_client().get(
                 request_url,
                 headers=headers,
                 params=params,
-                timeout=config.worldanvil_api_timeout_seconds,
+                timeout=timeout,
             )
+            answered = answered or response.status_code < 500
             if response.status_code == 404:
                 break
             response.raise_for_status()
@@ -134,8 +175,16 @@ def resolve_image_via_api(image_id):
             if metadata:
                 break
         except Exception as exc:
+            last_error = exc
             if config.DEBUG:
                 print(f"Failed API image lookup for {image_id}: {exc}")
+    telemetry.add_gauge("api_lookups_in_flight", -1)
+    # One event per lookup, however many attempts it took.
+    if answered:
+        telemetry.record("api_lookup")
+    else:
+        telemetry.record("api_lookup", error=last_error or "no answer within the API time budget")
+    api_breaker.record(time.monotonic() - started, failed=not answered)
 
     api_image_cache[image_id] = metadata
     return metadata
@@ -211,10 +260,45 @@ def replace_inline_image_tag(match):
         return match.group(0)
 
     register_image_job(metadata["url"], metadata["filename"])
-    return render_inline_image_embed(metadata["filename"], image_params)
+    return render_inline_image_embed(vault_image_filename(metadata["filename"]), image_params)
+
+
+async def fetch_image(client, limiter, url):
+    import asyncio
+
+    import httpx
+
+    attempts = max(1, config.download_retries + 1)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        started = time.monotonic()
+        try:
+            response = await client.get(url)
+        except httpx.TimeoutException:
+            limiter.record_congestion()
+            if last_attempt:
+                raise
+            continue
+
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = parse_retry_after(response)
+            limiter.record_congestion(retry_after)
+            if not last_attempt:
+                await asyncio.sleep(retry_after or 0.5 * 2 ** attempt)
+                continue
+        response.raise_for_status()
+        limiter.record_success(time.monotonic() - started, len(response.content))
+        return response
+
+
+def parse_retry_after(response):
+    try:
+        return min(60.0, max(0.0, float(response.headers.get("Retry-After"))))
+    except (TypeError, ValueError):
+        return None
 
 
-async def download_image(client, semaphore, url, filename):
+async def download_image(client, limiter, url, filename, image_sizes=None):
     if not url or not filename:
         if config.DEBUG:
             print(f"No URL or filename provided for image: {filename}")
@@ -222,36 +306,159 @@ async def download_image(client, semaphore, url, filename):
 
     normalized_filename = normalize_image_filename(filename)
     destination_path = os.path.join(config.obsidian_resource_folder, normalized_filename)
-    if os.path.exists(destination_path):
+    processed_path = os.path.join(config.obsidian_resource_folder, vault_image_filename(normalized_filename))
+    if os.path.exists(destination_path) or os.path.exists(processed_path):
+        telemetry.record("download", skipped=True)
         return
 
-    async with semaphore:
+    async with limiter:
+        telemetry.add_gauge("downloads_in_flight", 1)
         try:
             if config.DEBUG:
                 print(url)
-            response = await client.get(url)
-            response.raise_for_status()
+            response = await fetch_image(client, limiter, url)
             with open(destination_path, "wb") as image_file:
                 image_file.write(response.content)
+            verify.record_image(destination_path, response.content)
+            telemetry.record("download", nbytes=len(response.content))
+            if image_sizes is not None:
+                image_sizes[normalized_filename] = len(response.content)
         except Exception as e:
+            telemetry.record("download", error=e)
             print(f"Failed to download or save image {normalized_filename}. Error: {e}")
+        finally:
+            telemetry.add_gauge("downloads_in_flight", -1)
+            telemetry.set_gauge("download_concurrency", limiter.current)
+
+
+def merge_image_jobs(pending_jobs, image_jobs):
+    # Keyed by output filename so repeated images collapse as soon as they
+    # arrive. Jobs are (url, filename, kind); two-item jobs from older
+    # checkpoints and shard manifests count as inline. An image used both as a
+    # cover and inline keeps the higher priority.
+    for job in image_jobs:
+        url, filename = job[0], job[1]
+        kind = job[2] if len(job) > 2 and job[2] in IMAGE_JOB_PRIORITY else "inline"
+        normalized_filename = normalize_image_filename(filename)
+        if not normalized_filename or not url:
+            continue
+        previous = pending_jobs.get(normalized_filename)
+        if previous and IMAGE_JOB_PRIORITY[previous[2]] < IMAGE_JOB_PRIORITY[kind]:
+            kind = previous[2]
+        pending_jobs[normalized_filename] = (url, normalized_filename, kind)
+    return pending_jobs
+
 
+def prioritize_image_jobs(image_jobs, image_sizes):
+    # Cover/portrait/map first, then smallest first so a few huge images do not
+    # hold back the rest. Sizes come from earlier runs; unknown images rank as
+    # the median known size.
+    known_sizes = sorted(size for size in image_sizes.values() if isinstance(size, int))
+    default_size = known_sizes[len(known_sizes) // 2] if known_sizes else 0
 
-async def download_images(image_jobs):
+    def priority(job):
+        size = image_sizes.get(job[1])
+        return IMAGE_JOB_PRIORITY[job[2]], size if isinstance(size, int) else default_size
+
+    return sorted(image_jobs, key=priority)
+
+
+async def download_images(image_jobs, client=None):
     if not image_jobs:
         return
 
-    deduped_jobs = {}
-    for url, filename in image_jobs:
-        normalized_filename = normalize_image_filename(filename)
-        if normalized_filename and url:
-            deduped_jobs[normalized_filename] = (url, normalized_filename)
-
-    semaphore = asyncio.Semaphore(config.download_concurrency)
-    timeout = httpx.Timeout(config.download_timeout_seconds)
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-        tasks = [
-            download_image(client, semaphore, url, filename)
-            for url, filename in deduped_jobs.values()
-        ]
-        await asyncio.gather(*tasks)
+    deduped_jobs = merge_image_jobs({}, image_jobs)
+    telemetry.stage_started("download", total=len(deduped_jobs))
+
+    image_sizes = load_image_sizes(config.image_size_history_file)
+    queue = prioritize_image_jobs(deduped_jobs.values(), image_sizes)
+    image_ids = {metadata.get("filename"): metadata.get("id") for metadata in local_image_index.values()}
+    queue = import_local_images(queue, image_ids)
+    if client is None:
+        client = lookup_client()
+        if not isinstance(client, SharedHttpClient):
+            client = get_shared_client()
+    try:
+        if isinstance(client, SharedHttpClient):
+            limiter = await client.run(download_image_jobs(client.client, queue, image_sizes))
+        else:
+            limiter = await download_image_jobs(client, queue, image_sizes)
+    finally:
+        save_image_sizes(config.image_size_history_file, image_sizes)
+    telemetry.stage_finished("download")
+    print_download_summary(limiter.summary())
+
+
+async def download_image_jobs(client, queue, image_sizes=None):
+    # Workers take jobs from the prioritized queue in order, so the important
+    # images land first and an interrupted run already has them. The limiter
+    # still decides how many downloads are in flight; it is built here so its
+    # condition belongs to the loop the downloads run on (the client's loop
+    # for a SharedHttpClient). Returns the limiter.
+    import asyncio
+
+    limiter = build_download_limiter()
+    pending = iter(queue)
+
+    async def worker():
+        for url, filename, _ in pending:
+            await download_image(client, limiter, url, filename, image_sizes)
+
+    await asyncio.gather(*(worker() for _ in range(min(len(queue), limiter.maximum))))
+    return limiter
+
+
+def load_image_sizes(path):
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as sizes_file:
+            sizes = json.load(sizes_file)
+    except (OSError, ValueError):
+        return {}
+    return sizes if isinstance(sizes, dict) else {}
+
+
+def save_image_sizes(path, image_sizes):
+    if not path or not image_sizes:
+        return
+    write_json_atomically(path, image_sizes, sort_keys=True)
+
+
+def build_download_limiter():
+    if not config.download_concurrency_adaptive:
+        return AdaptiveLimiter(config.download_concurrency, config.download_concurrency, config.download_concurrency)
+    return AdaptiveLimiter(
+        config.download_concurrency,
+        config.download_concurrency_min,
+        config.download_concurrency_max,
+        latency_tolerance=config.download_latency_tolerance,
+    )
+
+
+def print_api_lookup_summary(summary):
+    if not summary["lookups"] and not summary["skipped"]:
+        return
+    message = (
+        f"API image lookups: {summary['lookups']} made in {summary['seconds']:.1f}s "
+        f"({summary['failures']} failed), {summary['skipped']} skipped"
+    )
+    if summary["opened_by"] == "failures":
+        message += (
+            f"; stopped after {config.worldanvil_api_failure_threshold} consecutive failures"
+        )
+    elif summary["opened_by"] == "budget":
+        message += f"; stopped at the {config.worldanvil_api_time_budget_seconds}s time budget"
+    print(message)
+
+
+def print_download_summary(summary):
+    if not summary["completed"]:
+        return
+    megabytes = summary["bytes"] / (1024 * 1024)
+    rate = summary["bytes_per_second"] / (1024 * 1024)
+    print(
+        f"Downloaded {summary['completed']} images ({megabytes:.1f} MB, {rate:.2f} MB/s); "
+        f"concurrency {summary['concurrency']} (peak {summary['peak_concurrency']}, "
+        f"bounds {summary['minimum']}-{summary['maximum']}, {summary['congestion_events']} congestion events)"
+    )
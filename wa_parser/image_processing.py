@@ -0,0 +1,158 @@
+import json
+import os
+from importlib.util import find_spec
+
+from . import config, telemetry, verify
+from .utils import file_fingerprint, normalize_image_filename, write_json_atomically
+
+
+OUTPUT_EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+TRANSCODABLE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+_pillow_available = None
+
+
+def pillow_available():
+    global _pillow_available
+    if _pillow_available is None:
+        _pillow_available = find_spec("PIL") is not None
+    return _pillow_available
+
+
+def postprocess_active():
+    return bool(config.image_postprocess_enabled) and pillow_available()
+
+
+def vault_image_filename(filename):
+    # Name the note embeds must use: the transcoded file when post-processing
+    # changes the format, otherwise the downloaded file itself.
+    if not filename or not postprocess_active():
+        return filename
+    extension = OUTPUT_EXTENSIONS.get(config.image_output_format)
+    stem, current_extension = os.path.splitext(filename)
+    if not extension or current_extension.lower() not in TRANSCODABLE_EXTENSIONS:
+        return filename
+    return f"{stem}{extension}"
+
+
+def settings_signature():
+    return f"{config.image_output_format}:{config.image_max_dimension}:{config.image_output_quality}"
+
+
+def load_processed_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_processed_cache(cache_path, cache):
+    write_json_atomically(cache_path, cache, sort_keys=True)
+
+
+def is_already_processed(cache, output_filename, output_path, signature):
+    entry = cache.get(output_filename)
+    if not isinstance(entry, dict) or entry.get("signature") != signature:
+        return False
+    return entry.get("fingerprint") == file_fingerprint(output_path)
+
+
+def process_image(source_path, output_path, max_dimension, output_format, quality, keep_original):
+    # Runs in a worker process; returns (bytes before, bytes after).
+    from PIL import Image
+
+    source_size = os.path.getsize(source_path)
+    temporary_path = f"{output_path}.tmp"
+    with Image.open(source_path) as image:
+        image.load()
+        source_format = image.format
+        if max_dimension and max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        if output_format == "webp":
+            image.save(temporary_path, format="WEBP", quality=quality, method=4)
+        elif output_format == "jpeg":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(temporary_path, format="JPEG", quality=quality, optimize=True, progressive=True)
+        else:
+            save_options = {"optimize": True} if source_format in ("PNG", "JPEG") else {}
+            if source_format == "JPEG":
+                save_options["quality"] = quality
+            image.save(temporary_path, format=source_format, **save_options)
+
+    os.replace(temporary_path, output_path)
+    if source_path != output_path and not keep_original:
+        os.remove(source_path)
+    return source_size, os.path.getsize(output_path)
+
+
+def postprocess_images(image_jobs):
+    if not image_jobs or not config.image_postprocess_enabled:
+        return
+    if not pillow_available():
+        print("Image post-processing is enabled but Pillow is not installed; skipping.")
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    cache_path = config.image_postprocess_cache_file
+    cache = load_processed_cache(cache_path)
+    signature = settings_signature()
+    resource_folder = config.obsidian_resource_folder
+    pending = {}
+    for job in image_jobs:
+        source_filename = normalize_image_filename(job[1])
+        output_filename = vault_image_filename(source_filename)
+        source_path = os.path.join(resource_folder, source_filename)
+        output_path = os.path.join(resource_folder, output_filename)
+        if is_already_processed(cache, output_filename, output_path, signature):
+            continue
+        if not os.path.exists(source_path):
+            continue
+        pending[output_filename] = (source_path, output_path)
+
+    if not pending:
+        return
+
+    telemetry.stage_started("postprocess", total=len(pending))
+    bytes_before = 0
+    bytes_after = 0
+    processed = 0
+    with ProcessPoolExecutor(max_workers=config.image_postprocess_workers) as executor:
+        futures = {
+            executor.submit(
+                process_image,
+                source_path,
+                output_path,
+                config.image_max_dimension,
+                config.image_output_format,
+                config.image_output_quality,
+                config.image_keep_original,
+            ): output_filename
+            for output_filename, (source_path, output_path) in pending.items()
+        }
+        for future in as_completed(futures):
+            output_filename = futures[future]
+            try:
+                source_size, output_size = future.result()
+            except Exception as exc:
+                telemetry.record("postprocess", error=exc)
+                print(f"Failed to post-process image {output_filename}. Error: {exc}")
+                continue
+            bytes_before += source_size
+            bytes_after += output_size
+            processed += 1
+            telemetry.record("postprocess", nbytes=output_size)
+            source_path, output_path = pending[output_filename]
+            verify.record_image(output_path)
+            if source_path != output_path and not config.image_keep_original:
+                verify.forget_image(source_path)
+            cache[output_filename] = {"signature": signature, "fingerprint": file_fingerprint(output_path)}
+
+    telemetry.stage_finished("postprocess")
+    save_processed_cache(cache_path, cache)
+    saved_megabytes = (bytes_before - bytes_after) / (1024 * 1024)
+    print(f"Post-processed {processed} images ({saved_megabytes:.1f} MB saved)")
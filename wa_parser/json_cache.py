@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import pickle
+
+from . import config
+
+
+# Bump whenever the decoded form of an export file changes meaning, so every
+# cached entry written by an older parser is ignored.
+PARSER_VERSION = 1
+CACHE_SUFFIX = ".pickle"
+
+
+def cache_entry_path(cache_directory, path, stat):
+    # mtime and size are part of the key: an edited file simply misses and its
+    # old entry ages out through LRU eviction.
+    key = f"{PARSER_VERSION}\0{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_directory, digest[:2], f"{digest}{CACHE_SUFFIX}")
+
+
+def load_json_file(path):
+    cache_directory = config.json_cache_directory
+    if not cache_directory:
+        with open(path, "r", encoding="utf-8") as source_file:
+            return json.load(source_file)
+
+    entry_path = cache_entry_path(cache_directory, path, os.stat(path))
+    try:
+        with open(entry_path, "rb") as entry_file:
+            data = pickle.load(entry_file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        pass
+    else:
+        # Touching the entry is what makes eviction least-recently-used.
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return data
+
+    with open(path, "rb") as source_file:
+        data = json.loads(source_file.read().decode("utf-8"))
+    store_entry(entry_path, data)
+    return data
+
+
+def store_entry(entry_path, data):
+    # Render workers may store the same entry concurrently; the pid keeps their
+    # temporary files apart and os.replace makes the last writer win.
+    temporary_path = f"{entry_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        with open(temporary_path, "wb") as entry_file:
+            pickle.dump(data, entry_file, protocol=5)
+        os.replace(temporary_path, entry_path)
+    except (OSError, pickle.PicklingError):
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+
+
+def prune_json_cache(cache_directory=None, max_megabytes=None):
+    # Deletes least recently used entries until the cache fits its size budget;
+    # returns (entries removed, bytes removed).
+    cache_directory = cache_directory or config.json_cache_directory
+    max_megabytes = config.json_cache_max_mb if max_megabytes is None else max_megabytes
+    if not cache_directory or not os.path.isdir(cache_directory):
+        return 0, 0
+
+    entries = []
+    total_bytes = 0
+    for root, _, files in os.walk(cache_directory):
+        for filename in files:
+            if not filename.endswith(CACHE_SUFFIX):
+                continue
+            entry_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+            total_bytes += stat.st_size
+
+    budget = max(0, max_megabytes) * 1024 * 1024
+    removed = 0
+    removed_bytes = 0
+    for _, size, entry_path in sorted(entries):
+        if total_bytes - removed_bytes <= budget:
+            break
+        try:
+            os.remove(entry_path)
+        except OSError:
+            continue
+        removed += 1
+        removed_bytes += size
+    return removed, removed_bytes
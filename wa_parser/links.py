@@ -0,0 +1,95 @@
+import os
+
+from . import verify
+
+
+active_links = None
+
+
+def begin_link_collection():
+    global active_links
+    active_links = []
+
+
+def end_link_collection():
+    global active_links
+    links = active_links or []
+    active_links = None
+    return links
+
+
+def register_link(title):
+    if active_links is None or not title:
+        return
+    active_links.append(title)
+
+
+def link_key(title):
+    # Obsidian resolves [[links]] to note basenames case-insensitively.
+    return str(title).split("|", 1)[0].split("#", 1)[0].strip().lower()
+
+
+class LinkGraph:
+    def __init__(self):
+        self.notes = {}
+        self.outgoing = {}
+
+    def clear(self):
+        self.notes.clear()
+        self.outgoing.clear()
+
+    def add_note(self, markdown_filename, links):
+        note_title = os.path.splitext(os.path.basename(markdown_filename))[0]
+        self.notes[link_key(note_title)] = markdown_filename
+        self.outgoing[markdown_filename] = list(dict.fromkeys(links))
+
+    def broken_links(self):
+        broken = []
+        for source_path, targets in self.outgoing.items():
+            for target in targets:
+                if link_key(target) not in self.notes:
+                    broken.append((source_path, target))
+        return broken
+
+    def backlinks(self):
+        incoming = {}
+        for source_path, targets in self.outgoing.items():
+            source_title = os.path.splitext(os.path.basename(source_path))[0]
+            for target in targets:
+                target_path = self.notes.get(link_key(target))
+                if target_path and target_path != source_path:
+                    incoming.setdefault(target_path, []).append(source_title)
+        return incoming
+
+
+link_graph = LinkGraph()
+
+
+def write_broken_link_report(report_path, broken_links, root_directory):
+    report_directory = os.path.dirname(report_path)
+    if report_directory:
+        os.makedirs(report_directory, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        for source_path, target in sorted(broken_links):
+            report_file.write(f"{os.path.relpath(source_path, root_directory)}\t{target}\n")
+
+
+def append_backlink_sections(backlinks):
+    for target_path, source_titles in backlinks.items():
+        lines = "\n".join(f"- [[{title}]]" for title in sorted(set(source_titles)))
+        with open(target_path, "a", encoding="utf-8") as markdown_file:
+            markdown_file.write(f"\n## Backlinks\n\n{lines}\n")
+
+
+def check_links(root_directory, report_path=None, add_backlinks=False, zip_pack=False):
+    broken_links = link_graph.broken_links()
+    print(f"Link check: {len(broken_links)} broken links across {len(link_graph.outgoing)} notes")
+    if report_path:
+        write_broken_link_report(report_path, broken_links, root_directory)
+    if add_backlinks:
+        if zip_pack:
+            print("Backlink sections are not added to .zip packs.")
+        else:
+            backlinks = link_graph.backlinks()
+            append_backlink_sections(backlinks)
+            verify.refresh_notes(backlinks)
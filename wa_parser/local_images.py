@@ -0,0 +1,148 @@
+import os
+import shutil
+from urllib.parse import unquote, urlsplit
+
+from . import config, telemetry, verify
+from .image_processing import vault_image_filename
+from .utils import normalize_image_filename
+
+
+# ioctl request number of FICLONE (linux/fs.h): share the source's extents on
+# copy-on-write filesystems such as Btrfs and XFS.
+FICLONE = 0x40049409
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".svg", ".avif")
+
+
+def local_image_directories():
+    directories = [os.path.join(config.source_directory, "images")]
+    directories.extend(config.local_image_directories or ())
+    return [directory for directory in directories if directory and os.path.isdir(directory)]
+
+
+def build_local_binary_index(directories):
+    # {lowercased file name: path} for every image binary under the given
+    # directories; the first directory wins when names collide.
+    index = {}
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    index.setdefault(filename.lower(), os.path.join(root, filename))
+    return index
+
+
+def local_binary_candidates(url, filename, image_ids):
+    # A binary may be stored under the vault file name, the CDN file name or
+    # the World Anvil image id with the image's extension.
+    candidates = [filename]
+    url_name = unquote(os.path.basename(urlsplit(url).path))
+    if url_name:
+        candidates.append(url_name)
+    image_id = image_ids.get(filename)
+    if image_id:
+        extension = os.path.splitext(filename)[1] or os.path.splitext(url_name)[1]
+        candidates.append(f"{image_id}{extension}")
+    return [candidate.lower() for candidate in candidates if candidate]
+
+
+def clone_file(source_path, destination_path):
+    # Reflink first, then an in-kernel copy, then a plain copy. Returns the
+    # method that worked.
+    with open(source_path, "rb") as source_file, open(destination_path, "wb") as destination_file:
+        try:
+            import fcntl
+
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+            return "reflinked"
+        except (ImportError, OSError):
+            pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                remaining = os.fstat(source_file.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(source_file.fileno(), destination_file.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining == 0:
+                    return "copied"
+            except OSError:
+                pass
+            source_file.seek(0)
+            destination_file.seek(0)
+            destination_file.truncate()
+        shutil.copyfileobj(source_file, destination_file, 1024 * 1024)
+        return "copied"
+
+
+def place_local_image(source_path, destination_path):
+    # Written under a temporary name and moved into place, so an interrupted
+    # import never leaves a truncated image that later runs would skip.
+    temporary_path = f"{destination_path}.tmp-{os.getpid()}"
+    try:
+        if config.local_image_link_mode == "hardlink":
+            try:
+                os.link(source_path, temporary_path)
+                os.replace(temporary_path, destination_path)
+                return "hardlinked"
+            except OSError:
+                pass
+        method = clone_file(source_path, temporary_path)
+        os.replace(temporary_path, destination_path)
+        return method
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def import_local_images(image_jobs, image_ids):
+    # Places every job whose binary exists locally into obsidian_resource_folder
+    # and returns the jobs that still need a download.
+    if not config.local_image_import_enabled or not image_jobs:
+        return image_jobs
+    binary_index = build_local_binary_index(local_image_directories())
+    if not binary_index:
+        return image_jobs
+
+    remaining = []
+    methods = {}
+    imported_bytes = 0
+    resource_folder = os.path.abspath(config.obsidian_resource_folder)
+    for job in image_jobs:
+        url, filename = job[0], normalize_image_filename(job[1])
+        source_path = next(
+            (
+                binary_index[candidate]
+                for candidate in local_binary_candidates(url, filename, image_ids)
+                if candidate in binary_index
+            ),
+            None,
+        )
+        destination_path = os.path.join(resource_folder, filename)
+        if (
+            source_path is None
+            or os.path.abspath(source_path) == destination_path
+            or os.path.exists(destination_path)
+            or os.path.exists(os.path.join(resource_folder, vault_image_filename(filename)))
+        ):
+            # Jobs already in the vault are left to download_image, which skips them.
+            remaining.append(job)
+            continue
+        try:
+            method = place_local_image(source_path, destination_path)
+        except OSError as exc:
+            if config.DEBUG:
+                print(f"Unable to import local image {source_path}: {exc}")
+            remaining.append(job)
+            continue
+        size = os.path.getsize(destination_path)
+        verify.record_image(destination_path)
+        methods[method] = methods.get(method, 0) + 1
+        imported_bytes += size
+        telemetry.record("local_import", nbytes=size)
+
+    if methods:
+        imported = sum(methods.values())
+        details = ", ".join(f"{count} {method}" for method, count in sorted(methods.items()))
+        print(f"Imported {imported} images from local files ({imported_bytes / (1024 * 1024):.1f} MB; {details})")
+    return remaining
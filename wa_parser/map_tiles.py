@@ -0,0 +1,227 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+
+from . import config, telemetry, verify
+from .image_pipeline import download_images
+from .image_processing import pillow_available, vault_image_filename
+from .utils import hash_file, normalize_image_filename, write_json_atomically
+
+
+TILE_EXTENSIONS = {"png": "png", "webp": "webp", "jpeg": "jpg"}
+TILE_INDEX_FILENAME = "index.json"
+TILE_SET_FILENAME = "tiles.json"
+
+
+def tiles_directory():
+    return config.leaflet_tiles_directory or os.path.join(config.obsidian_resource_folder, "map-tiles")
+
+
+def tile_settings_signature():
+    return f"{config.leaflet_tile_size}:{config.leaflet_tile_format}:{config.leaflet_tile_quality}"
+
+
+def max_zoom_for(width, height, tile_size):
+    # Native zoom levels: at max_zoom the image is at full resolution, and each
+    # level below halves it until it fits in a single tile at zoom 0.
+    return max(0, math.ceil(math.log2(max(width, height, 1) / tile_size)))
+
+
+def build_tile_pyramid(source_path, tile_set_directory, tile_size, tile_format, quality):
+    # Runs in a worker process. Tiles follow the slippy-map z/x/y layout with
+    # the image anchored at the top-left corner; only tiles that overlap the
+    # image are written. Returns the tile set metadata.
+    from PIL import Image
+
+    # World maps are far beyond Pillow's decompression-bomb limit; these are
+    # the user's own exported images.
+    Image.MAX_IMAGE_PIXELS = None
+    extension = TILE_EXTENSIONS[tile_format]
+    temporary_directory = f"{tile_set_directory}.tmp-{os.getpid()}"
+    tile_count = 0
+    with Image.open(source_path) as image:
+        image.load()
+        width, height = image.size
+        mode = "RGB" if tile_format == "jpeg" else "RGBA"
+        level = image.convert(mode) if image.mode != mode else image
+        max_zoom = max_zoom_for(width, height, tile_size)
+        for zoom in range(max_zoom, -1, -1):
+            if zoom < max_zoom:
+                scale = 2 ** (max_zoom - zoom)
+                level = level.resize(
+                    (max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))), Image.LANCZOS
+                )
+            columns = math.ceil(level.width / tile_size)
+            rows = math.ceil(level.height / tile_size)
+            for x in range(columns):
+                column_directory = os.path.join(temporary_directory, str(zoom), str(x))
+                os.makedirs(column_directory, exist_ok=True)
+                for y in range(rows):
+                    left, top = x * tile_size, y * tile_size
+                    tile = level.crop(
+                        (left, top, min(level.width, left + tile_size), min(level.height, top + tile_size))
+                    )
+                    if tile.size != (tile_size, tile_size):
+                        padded = Image.new(mode, (tile_size, tile_size))
+                        padded.paste(tile, (0, 0))
+                        tile = padded
+                    tile_path = os.path.join(column_directory, f"{y}.{extension}")
+                    if tile_format == "png":
+                        tile.save(tile_path, format="PNG", optimize=True)
+                    else:
+                        tile.save(tile_path, format=tile_format.upper(), quality=quality)
+                    tile_count += 1
+
+    metadata = {
+        "width": width,
+        "height": height,
+        "tile_size": tile_size,
+        "format": tile_format,
+        "max_zoom": max_zoom,
+        "tiles": tile_count,
+    }
+    with open(os.path.join(temporary_directory, TILE_SET_FILENAME), "w", encoding="utf-8") as metadata_file:
+        json.dump(metadata, metadata_file, sort_keys=True)
+    try:
+        os.replace(temporary_directory, tile_set_directory)
+    except OSError:
+        # Another run (e.g. a parallel shard) finished the same tile set first.
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+    return metadata
+
+
+def load_tile_set(tile_set_directory):
+    try:
+        with open(os.path.join(tile_set_directory, TILE_SET_FILENAME), "r", encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+    except (OSError, ValueError):
+        return None
+    return metadata if isinstance(metadata, dict) else None
+
+
+def load_tile_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+    return index if isinstance(index, dict) else {}
+
+
+def save_tile_index(path, index):
+    write_json_atomically(path, index, sort_keys=True)
+    verify.record_image(path)
+
+
+def map_source_path(filename):
+    # The downloaded base image, or its post-processed replacement when the
+    # original was not kept.
+    resource_folder = config.obsidian_resource_folder
+    for candidate in (filename, vault_image_filename(filename)):
+        path = os.path.join(resource_folder, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def tile_set_name(source_path, signature, index):
+    # Tile sets are named by the hash of the image content and tile settings.
+    # The hash is remembered per source file (size and mtime), so unchanged
+    # maps are neither re-hashed nor re-tiled.
+    stat = os.stat(source_path)
+    fingerprint = [stat.st_size, stat.st_mtime_ns]
+    entry = index.get(source_path)
+    if isinstance(entry, dict) and entry.get("fingerprint") == fingerprint and entry.get("signature") == signature:
+        return entry["tile_set"]
+    content_hash = hash_file(source_path)
+    name = hashlib.sha1(f"{content_hash}:{signature}".encode("utf-8")).hexdigest()[:20]
+    index[source_path] = {"fingerprint": fingerprint, "signature": signature, "tile_set": name}
+    return name
+
+
+def tile_url_template(tile_set, metadata):
+    extension = TILE_EXTENSIONS[metadata["format"]]
+    base_url = config.leaflet_tile_url_base
+    if not base_url:
+        base_url = Path(os.path.abspath(tiles_directory())).as_uri()
+    return f"{base_url.rstrip('/')}/{tile_set}/{{z}}/{{x}}/{{y}}.{extension}"
+
+
+async def prepare_map_tiles(map_records, client=None):
+    # Downloads each map's base image ahead of rendering, tiles it in a
+    # process pool and attaches the tile set to the map record, so the
+    # rendered leaflet blocks point at the pyramid instead of the full image.
+    if not config.leaflet_tiles_enabled or not config.leaflet_plugin_support:
+        return
+    if config.leaflet_tile_format not in TILE_EXTENSIONS:
+        print(f"Unknown leaflet_tile_format {config.leaflet_tile_format!r}; skipping map tiles.")
+        return
+    if not pillow_available():
+        print("Map tiling is enabled but Pillow is not installed; skipping.")
+        return
+
+    mapped = []
+    for map_record in map_records:
+        image = map_record.get("image") or {}
+        filename = normalize_image_filename(image.get("filename"))
+        if filename and image.get("url"):
+            mapped.append((map_record, image["url"], filename))
+    if not mapped:
+        return
+    await download_images([(url, filename, "map") for _, url, filename in mapped], client=client)
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    root = tiles_directory()
+    os.makedirs(root, exist_ok=True)
+    index_path = os.path.join(root, TILE_INDEX_FILENAME)
+    index = load_tile_index(index_path)
+    signature = tile_settings_signature()
+    pending = {}
+    reused = 0
+    for map_record, _, filename in mapped:
+        source_path = map_source_path(filename)
+        if source_path is None:
+            continue
+        tile_set = tile_set_name(source_path, signature, index)
+        metadata = load_tile_set(os.path.join(root, tile_set))
+        if metadata:
+            map_record["tiles"] = dict(metadata, url=tile_url_template(tile_set, metadata))
+            reused += 1
+        else:
+            pending.setdefault(tile_set, (source_path, []))[1].append(map_record)
+
+    built = 0
+    if pending:
+        telemetry.stage_started("map_tiles", total=len(pending))
+        with ProcessPoolExecutor(max_workers=config.leaflet_tile_workers) as executor:
+            futures = {
+                executor.submit(
+                    build_tile_pyramid,
+                    source_path,
+                    os.path.join(root, tile_set),
+                    config.leaflet_tile_size,
+                    config.leaflet_tile_format,
+                    config.leaflet_tile_quality,
+                ): tile_set
+                for tile_set, (source_path, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                tile_set = futures[future]
+                source_path, records = pending[tile_set]
+                try:
+                    metadata = future.result()
+                except Exception as exc:
+                    telemetry.record("map_tiles", error=exc)
+                    print(f"Failed to tile map image {source_path}. Error: {exc}")
+                    continue
+                telemetry.record("map_tiles")
+                for map_record in records:
+                    map_record["tiles"] = dict(metadata, url=tile_url_template(tile_set, metadata))
+                built += 1
+        telemetry.stage_finished("map_tiles")
+    save_tile_index(index_path, index)
+    print(f"Map tiles: {built} maps tiled, {reused} unchanged")
@@ -1,8 +1,11 @@
-import json
+import math
 import os
 import re
 
 from . import config
+from .compact import compact_map_record
+from .image_processing import vault_image_filename
+from .json_cache import load_json_file
 
 
 map_index = []
@@ -60,8 +63,7 @@ def parse_map_folder(map_folder_path, image_index):
             continue
         file_path = os.path.join(map_folder_path, entry)
         try:
-            with open(file_path, "r", encoding="utf-8") as file_handle:
-                payload = json.load(file_handle)
+            payload = load_json_file(file_path)
         except Exception:
             continue
 
@@ -82,10 +84,11 @@ def parse_map_folder(map_folder_path, image_index):
         "folder_path": map_folder_path,
         "title_norm": normalize_lookup_text(map_title),
         "image": map_image,
+        "tiles": None,
     }
 
 
-def build_map_index(maps_root_directory, image_index):
+def build_map_index(maps_root_directory, image_index, compact=False):
     index = []
     if not os.path.isdir(maps_root_directory):
         return index
@@ -95,6 +98,8 @@ def build_map_index(maps_root_directory, image_index):
         if not os.path.isdir(folder_path):
             continue
         map_record = parse_map_folder(folder_path, image_index)
+        if compact:
+            map_record = compact_map_record(map_record)
         if map_record:
             index.append(map_record)
     return index
@@ -130,10 +135,16 @@ def render_leaflet_block(map_record):
         f"height: {config.leaflet_default_height}",
     ]
 
+    tiles = map_record.get("tiles")
+    if tiles:
+        lines.extend(render_tile_layer_lines(tiles))
+        lines.append("```")
+        return "\n".join(lines)
+
     map_image = map_record.get("image") or {}
     map_image_filename = map_image.get("filename")
     if map_image_filename:
-        lines.append(f"image: [[{map_image_filename}]]")
+        lines.append(f"image: [[{vault_image_filename(map_image_filename)}]]")
     else:
         return ""
 
@@ -141,6 +152,26 @@ def render_leaflet_block(map_record):
     return "\n".join(lines)
 
 
+def render_tile_layer_lines(tiles):
+    # The pyramid is laid out as slippy-map tiles with the image in the
+    # top-left corner of the zoom-0 tile, so the view is centred on the image's
+    # midpoint in Web Mercator coordinates. Zoom bounds come from config,
+    # clamped to the levels that were actually generated.
+    max_zoom = tiles["max_zoom"]
+    world_size = tiles["tile_size"] * 2 ** max_zoom
+    longitude = tiles["width"] / 2 / world_size * 360 - 180
+    latitude = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tiles["height"] / 2 / world_size))))
+    return [
+        f"tileServer: {tiles['url']}",
+        "osmLayer: false",
+        f"lat: {latitude:.6f}",
+        f"long: {longitude:.6f}",
+        f"minZoom: {min(config.leaflet_default_min_zoom, max_zoom)}",
+        f"maxZoom: {min(config.leaflet_default_max_zoom, max_zoom)}",
+        f"defaultZoom: {min(config.leaflet_default_zoom, max_zoom)}",
+    ]
+
+
 def build_leaflet_context_for_article(article_title):
     if not config.leaflet_plugin_support:
         return {"leaflet_block": "", "leaflet_map_image": None}
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import warnings
+
+from .utils import hash_file, write_json_atomically
+from .writer import NoteWriter, note_text
+
+
+SYNC_STATE_FILENAME = ".wa-sync-state.json"
+
+
+class ZipNoteWriter(NoteWriter):
+    # zipfile is not safe for concurrent writers, so the archive gets exactly one
+    # writer thread; rendering still overlaps with compression through the queue.
+    def __init__(self, archive_path, root_directory, queue_size=None):
+        import zipfile
+
+        archive_directory = os.path.dirname(archive_path)
+        if archive_directory:
+            os.makedirs(archive_directory, exist_ok=True)
+        self.archive_path = archive_path
+        self.root_directory = root_directory
+        self._archive = zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._arcnames = set()
+        self._replaced = False
+        super().__init__(workers=1, queue_size=queue_size)
+
+    def ensure_directories(self, directories):
+        return
+
+    def write_note(self, path, text):
+        arcname = os.path.relpath(path, self.root_directory).replace(os.sep, "/")
+        if arcname not in self._arcnames:
+            self._arcnames.add(arcname)
+            self._archive.writestr(arcname, note_text(text))
+            return
+        # A folder run overwrites the note; the archive keeps only the last
+        # entry of each name once it is closed.
+        self._replaced = True
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            self._archive.writestr(arcname, note_text(text))
+
+    def close(self):
+        errors = super().close()
+        self._archive.close()
+        if self._replaced:
+            drop_replaced_entries(self.archive_path)
+            self._replaced = False
+        return errors
+
+
+def drop_replaced_entries(archive_path):
+    import zipfile
+
+    temporary_path = f"{archive_path}.tmp"
+    with zipfile.ZipFile(archive_path) as source:
+        latest = {info.filename: info for info in source.infolist()}
+        with zipfile.ZipFile(temporary_path, "w") as target:
+            for info in latest.values():
+                target.writestr(info, source.read(info))
+    os.replace(temporary_path, archive_path)
+
+
+def is_zip_pack_path(pack_path):
+    return str(pack_path).lower().endswith(".zip")
+
+
+def load_staging_sync_state(staging_directory):
+    state_path = os.path.join(staging_directory, SYNC_STATE_FILENAME)
+    try:
+        with open(state_path, "r", encoding="utf-8") as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_staging_sync_state(staging_directory, state):
+    write_json_atomically(os.path.join(staging_directory, SYNC_STATE_FILENAME), state, sort_keys=True)
+
+
+def sync_staging_directory(staging_directory, destination_directory):
+    # Hashes of what was last synced live next to the staged notes, so deciding
+    # what changed never has to read files back from the (slow) destination.
+    previous_state = load_staging_sync_state(staging_directory)
+    state = {}
+    copied = 0
+    unchanged = 0
+    created_directories = set()
+    for root, _, files in os.walk(staging_directory):
+        for filename in files:
+            source_path = os.path.join(root, filename)
+            relative_path = os.path.relpath(source_path, staging_directory)
+            if relative_path == SYNC_STATE_FILENAME:
+                continue
+            file_hash = hash_file(source_path)
+            state[relative_path] = file_hash
+            destination_path = os.path.join(destination_directory, relative_path)
+            if previous_state.get(relative_path) == file_hash and os.path.exists(destination_path):
+                unchanged += 1
+                continue
+
+            destination_parent = os.path.dirname(destination_path)
+            if destination_parent not in created_directories:
+                os.makedirs(destination_parent, exist_ok=True)
+                created_directories.add(destination_parent)
+            shutil.copyfile(source_path, destination_path)
+            copied += 1
+
+    save_staging_sync_state(staging_directory, state)
+    return copied, unchanged
@@ -1,11 +1,8 @@
 import io
-import json
 import os
+import time
 
-import yaml
-from jinja2 import TemplateNotFound
-
-from . import config
+from . import config, links, telemetry, verify
 from .fields import (
     extract_type_title,
     extract_relations,
@@ -17,10 +14,15 @@ from .fields import (
     type_folder_name,
 )
 from .image_pipeline import begin_image_job_collection, end_image_job_collection, register_image_job
+from .image_processing import vault_image_filename
+from .json_cache import load_json_file
+from .links import begin_link_collection, end_link_collection
 from .maps import build_leaflet_context_for_article
+from .scheduling import file_size
 from .template_engine import build_yaml_data, render_its_template_body
-from .text_formatting import format_content
+from .text_formatting import bbcode_tag_stats, format_content
 from .utils import build_note_filename, create_parent_directory, normalize_image_filename
+from .writer import NoteChunks, write_note_file
 
 TO_SKIP = ["Image", "Manuscript"]
 
@@ -28,21 +30,69 @@ CUSTOM_ENTITY_TYPE_FOLDER_MAP = {
     "Category": "category",
 }
 
-def process_json_file(json_file, id_to_title, output_directory, use_template_folders=True):
-    begin_image_job_collection()
-    filename = os.path.basename(json_file)
-    with open(json_file, "r", encoding="utf-8") as source_file:
-        data = json.load(source_file)
+# {json file: position in export order} while claims are tracked, and
+# {markdown filename: position of the article that wrote it}.
+export_positions = None
+note_claims = {}
 
+def build_markdown_path(output_directory, template, type_subfolder, note_filename, use_template_folders=True):
+    if use_template_folders:
+        if type_subfolder:
+            return os.path.join(output_directory, template, type_subfolder, f"{note_filename}.md")
+        return os.path.join(output_directory, template, f"{note_filename}.md")
+    if type_subfolder:
+        return os.path.join(output_directory, type_subfolder, f"{note_filename}.md")
+    return os.path.join(output_directory, f"{note_filename}.md")
+
+
+def render_json_file(json_file, id_to_title, output_directory, use_template_folders=True):
+    data = load_json_file(json_file)
+    started = time.perf_counter()
+    rendered = render_article(data, os.path.basename(json_file), id_to_title, output_directory, use_template_folders)
+    report_slow_article(json_file, data, time.perf_counter() - started)
+    return rendered
+
+
+def collect_text(value, texts):
+    if isinstance(value, str):
+        texts.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            collect_text(item, texts)
+    elif isinstance(value, list):
+        for item in value:
+            collect_text(item, texts)
+    return texts
+
+
+def report_slow_article(json_file, data, seconds):
+    budget = config.article_time_budget_seconds
+    if not budget or seconds <= budget:
+        return
+    telemetry.record("slow_article")
+    text = "\n".join(collect_text(data, []))
+    tag_stats = bbcode_tag_stats(text)
+    # Unbalanced tags first: they are what sends the formatter down slow paths.
+    worst_tags = sorted(tag_stats.items(), key=lambda item: (-abs(item[1][0] - item[1][1]), -sum(item[1])))[:8]
+    tag_summary = ", ".join(f"{tag} {opened}/{closed}" for tag, (opened, closed) in worst_tags) or "none"
+    print(
+        f"Slow article {json_file}: {seconds:.2f}s (budget {budget}s), {file_size(json_file)} bytes, "
+        f"{len(text)} characters of text, tags opened/closed: {tag_summary}"
+    )
+
+
+def render_article(data, filename, id_to_title, output_directory, use_template_folders=True):
+    begin_image_job_collection()
+    begin_link_collection()
     if data is None:
         print(f"No data found for {filename}")
-        return end_image_job_collection()
+        return None, None, end_image_job_collection(), end_link_collection()
 
     template = data.get("templateType") or data.get("template") or CUSTOM_ENTITY_TYPE_FOLDER_MAP.get(data.get("entityClass")) or "other"
     yaml_data = build_yaml_data(data, template)
 
     if data.get("entityClass") in TO_SKIP:
-        return end_image_job_collection()
+        return None, None, end_image_job_collection(), end_link_collection()
 
     note_filename = build_note_filename(data, filename)
     type_subfolder = type_folder_name(extract_type_title(data))
@@ -53,75 +103,129 @@ def process_json_file(json_file, id_to_title, output_directory, use_template_fol
         leaflet_context = {"leaflet_block": "", "leaflet_map_image": {}}
     leaflet_block = leaflet_context.get("leaflet_block") or ""
     leaflet_map_image = leaflet_context.get("leaflet_map_image") or {}
-    if use_template_folders:
-        if type_subfolder:
-            markdown_filename = os.path.join(output_directory, template, type_subfolder, f"{note_filename}.md")
-        else:
-            markdown_filename = os.path.join(output_directory, template, f"{note_filename}.md")
-    else:
-        if type_subfolder:
-            markdown_filename = os.path.join(output_directory, type_subfolder, f"{note_filename}.md")
-        else:
-            markdown_filename = os.path.join(output_directory, f"{note_filename}.md")
-    create_parent_directory(markdown_filename)
-    with open(markdown_filename, "w", encoding="utf-8") as markdown_file:
-        cover = data.get("cover") or {}
-        cover_url = cover.get("url")
-        cover_title = normalize_image_filename(cover.get("title"))
-        has_image = bool(cover_url and cover_title)
-
+    markdown_filename = build_markdown_path(
+        output_directory, template, type_subfolder, note_filename, use_template_folders
+    )
+    # The note is assembled as a list of chunks: the template body is streamed
+    # into it, so a large article is not held as several full-size strings.
+    markdown_file = NoteChunks()
+    cover = data.get("cover") or {}
+    cover_url = cover.get("url")
+    cover_title = normalize_image_filename(cover.get("title"))
+    has_image = bool(cover_url and cover_title)
+
+    if has_image:
+        register_image_job(cover_url, cover_title, "cover")
+    if leaflet_map_image.get("url") and leaflet_map_image.get("filename"):
+        register_image_job(leaflet_map_image["url"], leaflet_map_image["filename"], "map")
+    cover_title = vault_image_filename(cover_title)
+
+    import yaml
+
+    frontmatter_buffer = io.StringIO()
+    yaml.dump(yaml_data, frontmatter_buffer, default_style="", default_flow_style=False, sort_keys=False)
+    markdown_file.write("---\n")
+    markdown_file.write(frontmatter_buffer.getvalue())
+    markdown_file.write("---\n")
+
+    template_applied = False
+    if config.its_theme_support:
+        from jinja2 import TemplateNotFound
+
+        body_start = len(markdown_file)
+        try:
+            last_chunk = ""
+            for chunk in render_its_template_body(
+                data,
+                id_to_title,
+                has_image,
+                cover_title,
+                template_name=template,
+                leaflet_block=leaflet_block,
+                stream=True,
+            ):
+                if chunk:
+                    markdown_file.append(chunk)
+                    last_chunk = chunk
+            if not last_chunk.endswith("\n"):
+                markdown_file.write("\n")
+            template_applied = True
+        except TemplateNotFound:
+            # An include can go missing mid-stream; drop what was written.
+            del markdown_file[body_start:]
+            if config.DEBUG:
+                print(f"ITS template not found for type '{template}'; falling back to default renderer.")
+
+    if not template_applied:
         if has_image:
-            register_image_job(cover_url, cover_title)
-        if leaflet_map_image.get("url") and leaflet_map_image.get("filename"):
-            register_image_job(leaflet_map_image["url"], leaflet_map_image["filename"])
-
-        frontmatter_buffer = io.StringIO()
-        yaml.dump(yaml_data, frontmatter_buffer, default_style="", default_flow_style=False, sort_keys=False)
-        markdown_file.write("---\n")
-        markdown_file.write(frontmatter_buffer.getvalue())
-        markdown_file.write("---\n")
-
-        template_applied = False
-        if config.its_theme_support:
-            try:
-                rendered_body = render_its_template_body(
-                    data,
-                    id_to_title,
-                    has_image,
-                    cover_title,
-                    template_name=template,
-                    leaflet_block=leaflet_block,
-                )
-                markdown_file.write(rendered_body)
-                if not rendered_body.endswith("\n"):
-                    markdown_file.write("\n")
-                template_applied = True
-            except TemplateNotFound:
-                if config.DEBUG:
-                    print(f"ITS template not found for type '{template}'; falling back to default renderer.")
-
-        if not template_applied:
-            if has_image:
-                markdown_file.write(f"![[{cover_title}]]\n\n")
-
-            title = data.get("title")
-            if title:
-                markdown_file.write(f"# {title}\n\n")
-
-            render_sidebar_content(data, markdown_file)
-            if leaflet_block:
-                markdown_file.write(f"\n{leaflet_block}\n\n")
-
-            content = data.get("content")
-            if not is_empty_value(content):
-                markdown_file.write(f"{format_content({'text': content})}\n\n")
-
-            render_navigation(data, markdown_file, id_to_title)
-
-            markdown_file.write("# Extras\n\n")
-            render_generic_fields(data, markdown_file)
-            extract_sections(data, markdown_file)
-            extract_relations(data, markdown_file)
-            markdown_file.write('<div style="clear: both;"></div>\n')
-
-    return end_image_job_collection()
+            markdown_file.write(f"![[{cover_title}]]\n\n")
+
+        title = data.get("title")
+        if title:
+            markdown_file.write(f"# {title}\n\n")
+
+        render_sidebar_content(data, markdown_file)
+        if leaflet_block:
+            markdown_file.write(f"\n{leaflet_block}\n\n")
+
+        content = data.get("content")
+        if not is_empty_value(content):
+            markdown_file.write(format_content({"text": content}))
+            markdown_file.write("\n\n")
+
+        render_navigation(data, markdown_file, id_to_title)
+
+        markdown_file.write("# Extras\n\n")
+        render_generic_fields(data, markdown_file)
+        extract_sections(data, markdown_file)
+        extract_relations(data, markdown_file)
+        markdown_file.write('<div style="clear: both;"></div>\n')
+
+    return markdown_filename, markdown_file, end_image_job_collection(), end_link_collection()
+
+
+def process_json_file(json_file, id_to_title, output_directory, use_template_folders=True, writer=None):
+    markdown_filename, markdown_text, image_jobs, note_links = render_json_file(
+        json_file,
+        id_to_title,
+        output_directory,
+        use_template_folders=use_template_folders,
+    )
+    write_rendered_note(markdown_filename, markdown_text, writer, note_links, source_file=json_file)
+    return image_jobs
+
+
+def begin_note_claims(json_files):
+    # Articles may render in any order (cost ordering, render workers), so
+    # when two of them produce the same note, the one later in export order
+    # is kept, as in a serial run over the export.
+    global export_positions, note_claims
+    export_positions = {json_file: position for position, json_file in enumerate(json_files)}
+    note_claims = {}
+
+
+def end_note_claims():
+    global export_positions, note_claims
+    export_positions, note_claims = None, {}
+
+
+def claim_note(markdown_filename, source_file):
+    position = None if export_positions is None else export_positions.get(source_file)
+    if position is None:
+        return True
+    if note_claims.get(markdown_filename, -1) > position:
+        return False
+    note_claims[markdown_filename] = position
+    return True
+
+
+def write_rendered_note(markdown_filename, markdown_text, writer=None, note_links=(), source_file=None):
+    if not markdown_filename or not claim_note(markdown_filename, source_file):
+        return
+    links.link_graph.add_note(markdown_filename, note_links)
+    verify.record_note(markdown_filename, markdown_text, source_file)
+    if writer is not None:
+        writer.submit(markdown_filename, markdown_text, key=source_file)
+    else:
+        create_parent_directory(markdown_filename)
+        write_note_file(markdown_filename, markdown_text)
@@ -0,0 +1,85 @@
+import time
+
+from . import http_client, image_pipeline, maps
+from .concurrency import CircuitBreaker
+from .fields import clear_field_fragment_cache
+from .processor import render_json_file
+from .settings import apply_config, snapshot_config
+
+
+IN_FLIGHT_PER_WORKER = 4
+
+_worker_id_to_title = None
+
+
+def init_render_worker(config_values, id_to_title, image_index, map_index, api_breaker_state):
+    # Workers may be spawned rather than forked, so every piece of module state
+    # the renderer reads is installed explicitly.
+    global _worker_id_to_title
+    apply_config(config_values)
+    clear_field_fragment_cache()
+    image_pipeline.local_image_index.clear()
+    image_pipeline.local_image_index.update(image_index)
+    maps.set_map_index(map_index)
+    # Workers share the parent's breaker, so failures and the time budget
+    # count across the whole run.
+    image_pipeline.api_breaker = CircuitBreaker(api_breaker_state)
+    # A forked worker inherits the parent's HTTP clients but not the threads
+    # running their event loops; each worker builds its own on first use.
+    image_pipeline.api_client = None
+    image_pipeline.api_client_factory = None
+    http_client.forget_shared_client()
+    _worker_id_to_title = id_to_title
+
+
+def render_in_worker(json_file, output_directory, use_template_folders):
+    # Errors come back as text: arbitrary exceptions are not guaranteed to pickle.
+    started = time.perf_counter()
+    try:
+        markdown_filename, markdown_text, image_jobs, links = render_json_file(
+            json_file,
+            _worker_id_to_title,
+            output_directory,
+            use_template_folders=use_template_folders,
+        )
+    except Exception as exc:
+        return None, None, [], [], time.perf_counter() - started, describe_error(exc)
+    return markdown_filename, markdown_text, image_jobs, links, time.perf_counter() - started, None
+
+
+def describe_error(exc):
+    return f"{type(exc).__name__}: {exc}"
+
+
+def render_with_pool(json_files, id_to_title, output_directory, use_template_folders, workers):
+    # Yields (json_file, markdown_filename, markdown_text, image_jobs, links, seconds, error)
+    # as renders complete; submission follows the given order with a bounded window.
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    pending = {}
+    remaining = iter(json_files)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_render_worker,
+        initargs=(
+            snapshot_config(),
+            id_to_title,
+            dict(image_pipeline.local_image_index),
+            maps.map_index,
+            image_pipeline.api_breaker.shared_state(),
+        ),
+    ) as executor:
+        while True:
+            while len(pending) < workers * IN_FLIGHT_PER_WORKER:
+                json_file = next(remaining, None)
+                if json_file is None:
+                    break
+                future = executor.submit(render_in_worker, json_file, output_directory, use_template_folders)
+                pending[future] = json_file
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                json_file = pending.pop(future)
+                yield (json_file, *future.result())
@@ -0,0 +1,58 @@
+import json
+import os
+
+from .utils import write_json_atomically
+
+
+def history_key(json_file, source_directory):
+    return os.path.relpath(json_file, source_directory).replace(os.sep, "/")
+
+
+def load_run_history(history_path):
+    if not history_path:
+        return {}
+    try:
+        with open(history_path, "r", encoding="utf-8") as history_file:
+            history = json.load(history_file)
+    except (OSError, ValueError):
+        return {}
+    timings = (history or {}).get("articles") if isinstance(history, dict) else None
+    return timings if isinstance(timings, dict) else {}
+
+
+def save_run_history(history_path, history, timings):
+    if not history_path:
+        return
+    merged = dict(history)
+    merged.update(timings)
+    write_json_atomically(history_path, {"articles": merged}, indent=0, sort_keys=True)
+
+
+def file_size(json_file):
+    try:
+        return os.path.getsize(json_file)
+    except OSError:
+        return 0
+
+
+def order_by_estimated_cost(json_files, history, source_directory):
+    # Longest-first keeps a worker pool saturated until the end instead of
+    # leaving a few huge articles as stragglers. Files without a recorded time
+    # are estimated from their size using the seconds-per-byte seen so far.
+    sizes = {json_file: file_size(json_file) for json_file in json_files}
+    known_seconds = 0.0
+    known_bytes = 0
+    for json_file in json_files:
+        seconds = history.get(history_key(json_file, source_directory))
+        if isinstance(seconds, (int, float)):
+            known_seconds += seconds
+            known_bytes += sizes[json_file]
+    seconds_per_byte = known_seconds / known_bytes if known_seconds and known_bytes else 1.0
+
+    def estimated_cost(json_file):
+        seconds = history.get(history_key(json_file, source_directory))
+        if isinstance(seconds, (int, float)):
+            return seconds
+        return sizes[json_file] * seconds_per_byte
+
+    return sorted(json_files, key=estimated_cost, reverse=True)
@@ -0,0 +1,39 @@
+import types
+
+from . import config
+
+
+def snapshot_config():
+    return {
+        name: value
+        for name, value in vars(config).items()
+        if not name.startswith("_") and not isinstance(value, types.ModuleType)
+    }
+
+
+def apply_config(values):
+    previous = {}
+    for name, value in values.items():
+        previous[name] = getattr(config, name)
+        setattr(config, name, value)
+    return previous
+
+
+class Settings:
+    # Snapshot of wa_parser.config plus overrides; every attribute of the
+    # config module can be overridden by keyword.
+    def __init__(self, **overrides):
+        values = snapshot_config()
+        unknown = sorted(set(overrides) - set(values))
+        if unknown:
+            raise TypeError(f"Unknown settings: {', '.join(unknown)}")
+        values.update(overrides)
+        self.__dict__.update(values)
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def replace(self, **overrides):
+        values = self.as_dict()
+        values.update(overrides)
+        return Settings(**values)
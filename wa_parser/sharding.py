@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+from . import links
+from .compact import CompactTitleIndex
+from .image_pipeline import merge_image_jobs
+from .scheduling import history_key
+from .utils import write_json_atomically
+
+
+TITLE_INDEX_VERSION = 1
+SHARD_MANIFEST_VERSION = 1
+
+
+def parse_shard(spec):
+    # "i/N" with 1 <= i <= N.
+    try:
+        index, count = (int(part) for part in str(spec).split("/", 1))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}; expected i/N, for example 2/8.") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec!r}; i must be between 1 and N.")
+    return index, count
+
+
+def shard_of(article_key, count):
+    # A stable hash, unlike hash(), so every machine agrees on the partition.
+    digest = hashlib.sha1(str(article_key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(json_files, file_ids, source_directory, shard):
+    # Files without an id (rare) are partitioned by their export path instead.
+    index, count = shard
+    selected = []
+    for json_file in json_files:
+        relative_path = history_key(json_file, source_directory)
+        if shard_of(file_ids.get(relative_path) or relative_path, count) == index:
+            selected.append(json_file)
+    return selected
+
+
+def shard_path(path, shard):
+    # Per-shard variant of a state file, so shards on one machine never share it.
+    if not path or not shard:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{extension}"
+
+
+def relative_file_ids(file_ids, source_directory):
+    return {history_key(json_file, source_directory): entity_id for json_file, entity_id in file_ids.items()}
+
+
+def save_title_index(path, id_to_title, file_ids):
+    write_json_atomically(
+        path, {"version": TITLE_INDEX_VERSION, "titles": dict(id_to_title), "files": file_ids}, ensure_ascii=False
+    )
+
+
+def load_title_index(path, compact=False):
+    # Returns (id_to_title, {export-relative path: entity id}).
+    with open(path, "r", encoding="utf-8") as index_file:
+        payload = json.load(index_file)
+    if not isinstance(payload, dict) or payload.get("version") != TITLE_INDEX_VERSION:
+        raise ValueError(f"{path} is not a title index written by this version of WA-Parser.")
+    titles = payload.get("titles") or {}
+    if compact:
+        id_to_title = CompactTitleIndex()
+        for article_id, title in titles.items():
+            id_to_title.add(article_id, title)
+        id_to_title.freeze()
+    else:
+        id_to_title = titles
+    return id_to_title, payload.get("files") or {}
+
+
+def default_manifest_path(shard):
+    return f"wa-shard-{shard[0]}-of-{shard[1]}.json"
+
+
+def write_shard_manifest(path, shard, note_directory, image_jobs, failed_articles):
+    # Note paths are stored relative to the note directory so the merge can run
+    # on another machine with the shared output tree mounted elsewhere.
+    notes = {
+        os.path.relpath(note_path, note_directory).replace(os.sep, "/"): targets
+        for note_path, targets in links.link_graph.outgoing.items()
+    }
+    write_json_atomically(
+        path,
+        {
+            "version": SHARD_MANIFEST_VERSION,
+            "shard": list(shard),
+            "image_jobs": [list(job) for job in image_jobs.values()],
+            "notes": notes,
+            "failed": failed_articles,
+        },
+        ensure_ascii=False,
+    )
+
+
+def merge_shard_manifests(manifest_paths, note_directory):
+    # Rebuilds the global link graph into links.link_graph and returns
+    # (image jobs deduplicated across shards, failed articles).
+    image_jobs = {}
+    failed_articles = {}
+    shards_seen = {}
+    links.link_graph.clear()
+    for manifest_path in manifest_paths:
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if not isinstance(manifest, dict) or manifest.get("version") != SHARD_MANIFEST_VERSION:
+            raise ValueError(f"{manifest_path} is not a shard manifest written by this version of WA-Parser.")
+        index, count = manifest["shard"]
+        shards_seen[index] = count
+        merge_image_jobs(image_jobs, manifest.get("image_jobs") or [])
+        failed_articles.update(manifest.get("failed") or {})
+        for note_path, targets in (manifest.get("notes") or {}).items():
+            links.link_graph.add_note(os.path.join(note_directory, *note_path.split("/")), targets)
+
+    counts = set(shards_seen.values())
+    if len(counts) == 1:
+        missing = sorted(set(range(1, counts.pop() + 1)) - set(shards_seen))
+        if missing:
+            print(f"Shard manifests missing for shards {', '.join(map(str, missing))}; links may be reported broken.")
+    elif counts:
+        print("Shard manifests come from runs with different shard counts.")
+    return image_jobs, failed_articles
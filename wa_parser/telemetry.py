@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+
+from . import config
+from .utils import atomic_output
+
+
+class StageStats:
+    __slots__ = ("name", "total", "count", "bytes", "errors", "skipped", "started", "finished")
+
+    def __init__(self, name, total=None):
+        self.name = name
+        self.total = total
+        self.count = 0
+        self.bytes = 0
+        self.errors = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def snapshot(self):
+        elapsed = self.elapsed()
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0 and self.finished is None:
+            eta = max(0.0, (self.total - self.count - self.skipped - self.errors) / rate)
+        return {
+            "stage": self.name,
+            "total": self.total,
+            "count": self.count,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(rate, 3),
+            "bytes_per_second": round(self.bytes / elapsed, 1) if elapsed > 0 else 0.0,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "finished": self.finished is not None,
+        }
+
+
+class Telemetry:
+    # Emits a JSON-lines event stream and/or a Prometheus textfile that a
+    # background thread refreshes every interval while the run is going.
+    def __init__(self, events_path=None, metrics_path=None, interval_seconds=None):
+        self.events_path = events_path
+        self.metrics_path = metrics_path
+        self.interval_seconds = interval_seconds or config.telemetry_interval_seconds
+        self.enabled = bool(events_path or metrics_path)
+        self._stages = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._events_file = None
+        self._thread = None
+        if events_path:
+            events_directory = os.path.dirname(events_path)
+            if events_directory:
+                os.makedirs(events_directory, exist_ok=True)
+            self._events_file = open(events_path, "a", encoding="utf-8")
+        if self.enabled:
+            self._thread = threading.Thread(target=self._refresh_loop, name="wa-telemetry", daemon=True)
+            self._thread.start()
+
+    def stage_started(self, stage, total=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._stages[stage] = StageStats(stage, total)
+        self.emit("stage_started", stage=stage, total=total)
+
+    def stage_finished(self, stage):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                return
+            stats.finished = time.monotonic()
+            snapshot = stats.snapshot()
+        self.emit("stage_finished", **snapshot)
+
+    def record(self, stage, count=1, nbytes=0, error=None, skipped=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(stage)
+            if error is not None:
+                stats.errors += count
+            elif skipped:
+                stats.skipped += count
+            else:
+                stats.count += count
+            stats.bytes += nbytes
+        if error is not None:
+            self.emit("error", stage=stage, error=str(error))
+
+    def set_gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_gauge(self, name, delta):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def emit(self, event, **fields):
+        if self._events_file is None:
+            return
+        line = json.dumps({"time": round(time.time(), 3), "event": event, **fields})
+        with self._lock:
+            self._events_file.write(line + "\n")
+            self._events_file.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return [stats.snapshot() for stats in self._stages.values()], dict(self._gauges)
+
+    def flush(self):
+        stages, gauges = self.snapshot()
+        for stage in stages:
+            if not stage["finished"]:
+                self.emit("progress", **stage)
+        if gauges:
+            self.emit("gauges", **gauges)
+        if self.metrics_path:
+            write_prometheus_textfile(self.metrics_path, stages, gauges)
+
+    def close(self):
+        if not self.enabled:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self._events_file is not None:
+            self._events_file.close()
+            self._events_file = None
+        self.enabled = False
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.flush()
+
+
+def write_prometheus_textfile(metrics_path, stages, gauges):
+    lines = []
+    stage_metrics = (
+        ("items_total", "counter", "count"),
+        ("bytes_total", "counter", "bytes"),
+        ("errors_total", "counter", "errors"),
+        ("skipped_total", "counter", "skipped"),
+        ("items_per_second", "gauge", "items_per_second"),
+        ("bytes_per_second", "gauge", "bytes_per_second"),
+        ("eta_seconds", "gauge", "eta_seconds"),
+        ("elapsed_seconds", "gauge", "elapsed_seconds"),
+    )
+    for suffix, metric_type, key in stage_metrics:
+        metric_name = f"wa_parser_stage_{suffix}"
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for stage in stages:
+            value = stage[key]
+            if value is not None:
+                lines.append(f'{metric_name}{{stage="{stage["stage"]}"}} {value}')
+    for name, value in sorted(gauges.items()):
+        metric_name = f"wa_parser_{name}"
+        lines.append(f"# TYPE {metric_name} gauge")
+        lines.append(f"{metric_name} {value}")
+
+    # node_exporter's textfile collector expects files to be replaced atomically.
+    with atomic_output(metrics_path) as metrics_file:
+        metrics_file.write("\n".join(lines) + "\n")
+
+
+telemetry = Telemetry()
+
+
+def start_telemetry(events_path=None, metrics_path=None, interval_seconds=None):
+    global telemetry
+    telemetry.close()
+    telemetry = Telemetry(events_path, metrics_path, interval_seconds)
+    return telemetry
+
+
+def stop_telemetry():
+    telemetry.close()
+
+
+def stage_started(stage, total=None):
+    telemetry.stage_started(stage, total)
+
+
+def stage_finished(stage):
+    telemetry.stage_finished(stage)
+
+
+def record(stage, count=1, nbytes=0, error=None, skipped=False):
+    telemetry.record(stage, count, nbytes, error, skipped)
+
+
+def set_gauge(name, value):
+    telemetry.set_gauge(name, value)
+
+
+def add_gauge(name, delta):
+    telemetry.add_gauge(name, delta)
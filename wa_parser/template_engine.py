@@ -1,8 +1,6 @@
 import os
 import re
 
-from jinja2 import Environment, FileSystemLoader
-
 from . import config
 from .fields import (
     collect_card_link_sections,
@@ -37,17 +35,47 @@ def build_yaml_data(data, template):
     return yaml_data
 
 
-def render_markdown_template(template_name, context):
+template_environment = None
+
+
+def build_template_environment(templates_directory):
+    from jinja2 import Environment, FileSystemLoader
+
     environment = Environment(
-        loader=FileSystemLoader(config.templates_directory),
+        loader=FileSystemLoader(templates_directory),
         autoescape=False,
         trim_blocks=True,
         lstrip_blocks=True,
     )
-    template = environment.get_template(template_name)
+    environment.templates_directory = templates_directory
+    return environment
+
+
+def set_template_environment(environment):
+    global template_environment
+    template_environment = environment
+
+
+def get_template_environment():
+    # Compiled templates are cached by the environment, so it is built once per
+    # templates directory instead of once per note.
+    global template_environment
+    if template_environment is None or template_environment.templates_directory != config.templates_directory:
+        template_environment = build_template_environment(config.templates_directory)
+    return template_environment
+
+
+def render_markdown_template(template_name, context):
+    template = get_template_environment().get_template(template_name)
     return template.render(**context)
 
 
+def stream_markdown_template(template_name, context):
+    # Yields the rendered note in chunks instead of building it as one string.
+    template = get_template_environment().get_template(template_name)
+    return template.generate(**context)
+
+
 def resolve_its_template_name(template_name):
     normalized = (template_name or "").strip().lower()
     if normalized:
@@ -119,7 +147,9 @@ def collect_top_summary_fields(data, template_name):
     return top_fields
 
 
-def render_its_template_body(data, id_to_title, has_image, cover_title, template_name, leaflet_block=""):
+def render_its_template_body(data, id_to_title, has_image, cover_title, template_name, leaflet_block="", stream=False):
+    # With stream=True the body comes back as an iterator of chunks.
+    render = stream_markdown_template if stream else render_markdown_template
     # Only render map-only output for actual map entities.
     entity_class = str((data or {}).get("entityClass") or "").strip().lower()
     if (
@@ -128,7 +158,7 @@ def render_its_template_body(data, id_to_title, has_image, cover_title, template
         and leaflet_block
         and entity_class == "map"
     ):
-        return render_markdown_template(
+        return render(
             "leaflet-minimal.j2",
             {
                 "leaflet_block": leaflet_block,
@@ -162,7 +192,7 @@ def render_its_template_body(data, id_to_title, has_image, cover_title, template
     card_section_keys = {"children", "childrenArticles", "articles"}
     title_field_keys = {"pronunciation", "subheading", "excerpt"}
     skip_keys = infobox_fact_keys.union(top_summary_keys).union(card_section_keys).union(title_field_keys)
-    return render_markdown_template(
+    return render(
         f"{resolved_template}.j2",
         {
             "title": data.get("title", ""),
@@ -2,11 +2,100 @@ import re
 
 from . import config
 from .image_pipeline import replace_inline_image_tag
+from .links import register_link
+
+# Tag parameters are capped at 1024 characters. An unbounded [^\]]* run makes
+# every unterminated tag rescan the rest of the text, which is quadratic.
+MENTION_PATTERN = re.compile(r"@\[([^\]]{1,1024})\]\([^)]{1,1024}\)")
 
 SPOTIFY_TAG_PATTERN = re.compile(
-    r"\[spotify:(https?://open\.spotify\.com/(track|album|playlist|episode|show)/([A-Za-z0-9]+)(?:\?[^\]]*)?)\]",
+    r"\[spotify:(https?://open\.spotify\.com/(track|album|playlist|episode|show)/([A-Za-z0-9]+)(?:\?[^\]]{0,1024})?)\]",
     flags=re.IGNORECASE,
 )
+INLINE_IMAGE_PATTERN = re.compile(r"\[img:(\d+)(\|[^\]]{0,1024})?\]|\[img\](\d+)\[/img\]", flags=re.IGNORECASE)
+SECTION_TAG_PATTERN = re.compile(r"\[section:[^\]]{0,1024}\]|\[/section\]", flags=re.IGNORECASE)
+CONTAINER_TAG_PATTERN = re.compile(r"\[container:[^\]]{0,1024}\]|\[/container\]", flags=re.IGNORECASE)
+LIST_ITEM_PATTERN = re.compile(r"\[\*\](.*?)\n?", flags=re.DOTALL)
+TAG_NAME_PATTERN = re.compile(r"\[(/?)([A-Za-z][A-Za-z0-9]*|\*)(?=[\]:|])")
+
+
+def replace_list_items(body):
+    return LIST_ITEM_PATTERN.sub(r"* \1\n", body)
+
+
+def replace_quote(body):
+    return "> " + "\n> ".join(body.split("\n"))
+
+
+# (tag, replacement for the tag body, whether the body may span lines), applied
+# in order. Same results as re.sub(r"\[tag\](.*?)\[/tag\]", ...) with re.DOTALL
+# for the multi-line tags.
+PAIRED_TAG_REPLACEMENTS = (
+    ("h1", lambda body: f"# {body}", False),
+    ("h2", lambda body: f"## {body}", False),
+    ("h3", lambda body: f"### {body}", False),
+    ("h4", lambda body: f"#### {body}", False),
+    ("p", lambda body: f"{body}\n", False),
+    ("b", lambda body: f"**{body}**", False),
+    ("i", lambda body: f"*{body}*", False),
+    ("u", lambda body: f"<u>{body}</u>", False),
+    ("s", lambda body: f"~~{body}~~", False),
+    ("url", lambda body: f"[{body}]", False),
+    ("list", replace_list_items, True),
+    ("code", lambda body: f"```\n{body}\n```", False),
+    ("quote", replace_quote, True),
+    ("sup", lambda body: f"<sup>{body}</sup>", False),
+    ("sub", lambda body: f"<sub>{body}</sub>", False),
+)
+
+
+def replace_paired_tag(text, tag, replace, multiline=False):
+    # Linear-time scan. The regex form retries every opening tag against the
+    # rest of the line (or text), which is quadratic on unclosed tags. Here, once
+    # an opening tag finds no closing tag before its line ends, no later opening
+    # tag on that line can either, so the scan skips to the next line.
+    open_tag = f"[{tag}]"
+    close_tag = f"[/{tag}]"
+    length = len(text)
+    parts = []
+    position = 0
+    search_from = 0
+    line_end = -1
+    while True:
+        start = text.find(open_tag, search_from)
+        if start < 0:
+            break
+        if multiline:
+            limit = length
+        else:
+            if start > line_end:
+                line_end = text.find("\n", start)
+                if line_end < 0:
+                    line_end = length
+            limit = line_end
+        body_start = start + len(open_tag)
+        end = text.find(close_tag, body_start, limit)
+        if end < 0:
+            if multiline:
+                break
+            search_from = limit
+            continue
+        parts.append(text[position:start])
+        parts.append(replace(text[body_start:end]))
+        position = search_from = end + len(close_tag)
+    if not parts:
+        return text
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def bbcode_tag_stats(text):
+    # {tag: [opening count, closing count]} for diagnosing slow articles.
+    stats = {}
+    for match in TAG_NAME_PATTERN.finditer(text):
+        counts = stats.setdefault(match.group(2).lower(), [0, 0])
+        counts[1 if match.group(1) else 0] += 1
+    return stats
 
 
 def replace_spotify_tag(match):
@@ -22,6 +111,12 @@ def replace_spotify_tag(match):
     )
 
 
+def replace_mention(match):
+    title = match.group(1)
+    register_link(title)
+    return f"[[{title}]]"
+
+
 def extract_spotify_embeds_and_text(raw_text):
     if not isinstance(raw_text, str):
         return [], raw_text
@@ -37,49 +132,21 @@ def format_content(content):
     if not isinstance(text, str):
         return str(text)
 
-    text = re.sub(r"@\[([^\]]+)\]\([^)]+\)", r"[[\1]]", text)
+    text = MENTION_PATTERN.sub(replace_mention, text)
     text = re.sub(r"\r\n\r", r"\n", text)
     text = SPOTIFY_TAG_PATTERN.sub(replace_spotify_tag, text)
-    text = re.sub(
-        r"\[img:(\d+)(\|[^\]]*)?\]|\[img\](\d+)\[/img\]",
-        replace_inline_image_tag,
-        text,
-        flags=re.IGNORECASE,
-    )
+    text = INLINE_IMAGE_PATTERN.sub(replace_inline_image_tag, text)
 
     if config.attempt_bbcode:
-        text = re.sub(r"\[section:[^\]]*\]|\[/section\]", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\[container:[^\]]*\]|\[/container\]", "", text, flags=re.IGNORECASE)
+        text = SECTION_TAG_PATTERN.sub("", text)
+        text = CONTAINER_TAG_PATTERN.sub("", text)
         text = re.sub(r"[ \t]+", " ", text)
         text = re.sub(r"\n +(\[h\d\])", r"\n\1", text)
         text = re.sub(r"\[br\]", r"\n", text)
-        text = re.sub(r"\[h1\](.*?)\[/h1\]", r"# \1", text)
-        text = re.sub(r"\[h2\](.*?)\[/h2\]", r"## \1", text)
-        text = re.sub(r"\[h3\](.*?)\[/h3\]", r"### \1", text)
-        text = re.sub(r"\[h4\](.*?)\[/h4\]", r"#### \1", text)
-        text = re.sub(r"\[p\](.*?)\[/p\]", r"\1\n", text)
-        text = re.sub(r"\[b\](.*?)\[/b\]", r"**\1**", text)
-        text = re.sub(r"\[i\](.*?)\[/i\]", r"*\1*", text)
-        text = re.sub(r"\[u\](.*?)\[/u\]", r"<u>\1</u>", text)
-        text = re.sub(r"\[s\](.*?)\[/s\]", r"~~\1~~", text)
-        text = re.sub(r"\[url\](.*?)\[/url\]", r"[\1]", text)
-        text = re.sub(
-            r"\[list\](.*?)\[/list\]",
-            lambda m: re.sub(r"\[\*\](.*?)\n?", r"* \1\n", m.group(1), flags=re.DOTALL),
-            text,
-            flags=re.DOTALL,
-        )
-        text = re.sub(r"\[code\](.*?)\[/code\]", r"```\n\1\n```", text)
-        text = re.sub(
-            r"\[quote\]([\s\S]*?)\[/quote\]",
-            lambda m: "> " + "\n> ".join(m.group(1).split("\n")),
-            text,
-            flags=re.DOTALL,
-        )
-        text = re.sub(r"\[sup\](.*?)\[/sup\]", r"<sup>\1</sup>", text)
-        text = re.sub(r"\[sub\](.*?)\[/sub\]", r"<sub>\1</sub>", text)
+        for tag, replace, multiline in PAIRED_TAG_REPLACEMENTS:
+            text = replace_paired_tag(text, tag, replace, multiline)
         text = re.sub(r"\[ol\]|\[/ol\]", r"", text)
         text = re.sub(r"\[ul\]|\[/ul\]", r"", text)
-        text = re.sub(r"\[li\](.*?)\[/li\]", r"- \1", text)
+        text = replace_paired_tag(text, "li", lambda body: f"- {body}")
 
     return text
@@ -1,5 +1,57 @@
+import hashlib
+import json
+import mmap
 import os
 import re
+from contextlib import contextmanager
+
+
+# Files at least this large are hashed through a read-only memory map instead
+# of being read into memory.
+MMAP_MIN_BYTES = 1024 * 1024
+
+
+def hash_file(file_path):
+    # hashlib releases the GIL on large buffers, so threads hash files in
+    # parallel.
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as source_file:
+        if os.fstat(source_file.fileno()).st_size >= MMAP_MIN_BYTES:
+            with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_output(path):
+    # Yields a text file that replaces path only once it is completely
+    # written, so an interrupted save never leaves a truncated file behind.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    try:
+        with open(temporary_path, "w", encoding="utf-8") as output_file:
+            yield output_file
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def write_json_atomically(path, payload, **dump_options):
+    with atomic_output(path) as output_file:
+        json.dump(payload, output_file, **dump_options)
+
+
+def file_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
 
 
 def normalize_image_filename(filename):
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from . import config
+from .utils import file_fingerprint, hash_file, write_json_atomically
+
+
+MANIFEST_VERSION = 1
+REPORT_LIMIT = 20
+
+active_manifest = None
+
+
+def hash_path(path):
+    # Returns (size, sha1).
+    return os.path.getsize(path), hash_file(path)
+
+
+def hash_paths(paths):
+    # {path: (size, sha1) or None when the file cannot be read}
+    from concurrent.futures import ThreadPoolExecutor
+
+    def safe_hash(path):
+        try:
+            return hash_path(path)
+        except OSError:
+            return None
+
+    workers = config.verify_workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(safe_hash, paths)))
+
+
+def encoded_note_size_and_hash(text):
+    # Notes are written in text mode, so hash the bytes that reach the disk.
+    digest = hashlib.sha1()
+    size = 0
+    for chunk in [text] if isinstance(text, str) else text:
+        data = chunk.encode("utf-8")
+        if os.linesep != "\n":
+            data = data.replace(b"\n", os.linesep.encode("ascii"))
+        digest.update(data)
+        size += len(data)
+    return size, digest.hexdigest()
+
+
+def relative_key(path, root):
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+
+
+def load_run_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+class RunManifest:
+    # What a run wrote: size and sha1 of every note (plus the export file and
+    # its fingerprint it was rendered from) and of every file in the image
+    # folder. With carry_over, entries from earlier runs into the same folders
+    # are kept, so partial and resumed runs add to one manifest. Otherwise the
+    # previous run's image entries are only used to skip re-hashing images
+    # whose size and mtime did not change.
+    def __init__(self, path, notes_root, images_root, note_directory=None, carry_over=False):
+        self.path = path
+        self.notes_root = os.path.abspath(notes_root)
+        self.images_root = os.path.abspath(images_root)
+        # Notes may be written to a staging folder and synced into notes_root
+        # later; keys are relative, so they hold for both.
+        self.note_directory = os.path.abspath(note_directory or notes_root)
+        self.notes = {}
+        self.images = {}
+        self.previous_images = {}
+        self._lock = threading.Lock()
+        previous = load_run_manifest(path)
+        if previous and previous.get("notes_root") == self.notes_root and previous.get("images_root") == self.images_root:
+            self.previous_images = previous.get("images") or {}
+            if carry_over:
+                self.notes.update(previous.get("notes") or {})
+                self.images.update(self.previous_images)
+
+    def adopt(self, path):
+        # Takes over the entries of another run into the same folders (the
+        # per-shard manifests, when shards are merged).
+        other = load_run_manifest(path)
+        if not other or other.get("notes_root") != self.notes_root or other.get("images_root") != self.images_root:
+            return False
+        with self._lock:
+            self.notes.update(other.get("notes") or {})
+            for key, entry in (other.get("images") or {}).items():
+                self.images.setdefault(key, entry)
+        return True
+
+    def record_note(self, path, text, source_file=None):
+        size, digest = encoded_note_size_and_hash(text)
+        entry = {"size": size, "sha1": digest}
+        if source_file:
+            entry["source"] = os.path.abspath(source_file)
+            entry["source_fingerprint"] = file_fingerprint(source_file)
+        with self._lock:
+            self.notes[relative_key(path, self.note_directory)] = entry
+
+    def refresh_notes(self, paths):
+        # For notes changed on disk after they were recorded (backlink sections).
+        hashes = hash_paths(list(paths))
+        with self._lock:
+            for path, result in hashes.items():
+                entry = self.notes.get(relative_key(path, self.note_directory))
+                if entry is not None and result is not None:
+                    entry["size"], entry["sha1"] = result
+
+    def record_image(self, path, data=None):
+        if data is None:
+            try:
+                size, digest = hash_path(path)
+            except OSError:
+                return
+        else:
+            size, digest = len(data), hashlib.sha1(data).hexdigest()
+        entry = {"size": size, "sha1": digest, "fingerprint": file_fingerprint(path)}
+        with self._lock:
+            self.images[relative_key(path, self.images_root)] = entry
+
+    def forget_image(self, path):
+        with self._lock:
+            self.images.pop(relative_key(path, self.images_root), None)
+
+    def record_unrecorded_images(self):
+        # Files in the image folder this run did not write (skipped because
+        # they already existed, map tiles) are covered too: by the previous
+        # run's entry when size and mtime match, otherwise by hashing them.
+        missing = []
+        for path, key in walk_files(self.images_root):
+            if key in self.images:
+                continue
+            fingerprint = file_fingerprint(path)
+            previous = self.previous_images.get(key)
+            if isinstance(previous, dict) and fingerprint and previous.get("fingerprint") == fingerprint:
+                self.images[key] = previous
+            else:
+                missing.append(path)
+        for path, result in hash_paths(missing).items():
+            if result is not None:
+                self.images[relative_key(path, self.images_root)] = {
+                    "size": result[0],
+                    "sha1": result[1],
+                    "fingerprint": file_fingerprint(path),
+                }
+
+    def save(self):
+        with self._lock:
+            payload = {
+                "version": MANIFEST_VERSION,
+                "notes_root": self.notes_root,
+                "images_root": self.images_root,
+                "notes": dict(self.notes),
+                "images": dict(self.images),
+            }
+        write_json_atomically(self.path, payload, ensure_ascii=False)
+
+
+def walk_files(root, extension=None):
+    # Yields (path, key relative to root); temporary files of interrupted
+    # writes are ignored.
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(".tmp") or ".tmp-" in filename or (extension and not filename.endswith(extension)):
+                continue
+            path = os.path.join(directory, filename)
+            yield path, relative_key(path, root)
+
+
+def start_run_manifest(path, notes_root, images_root, note_directory=None, carry_over=False):
+    global active_manifest
+    active_manifest = RunManifest(path, notes_root, images_root, note_directory, carry_over) if path else None
+    return active_manifest
+
+
+def finish_run_manifest():
+    global active_manifest
+    manifest, active_manifest = active_manifest, None
+    if manifest is None:
+        return
+    manifest.record_unrecorded_images()
+    manifest.save()
+
+
+def save_run_manifest():
+    if active_manifest is not None:
+        active_manifest.save()
+
+
+def adopt_run_manifests(paths):
+    if active_manifest is None:
+        return 0
+    return sum(1 for path in paths if active_manifest.adopt(path))
+
+
+def record_note(path, text, source_file=None):
+    if active_manifest is not None:
+        active_manifest.record_note(path, text, source_file)
+
+
+def refresh_notes(paths):
+    if active_manifest is not None:
+        active_manifest.refresh_notes(paths)
+
+
+def record_image(path, data=None):
+    if active_manifest is not None:
+        active_manifest.record_image(path, data)
+
+
+def forget_image(path):
+    if active_manifest is not None:
+        active_manifest.forget_image(path)
+
+
+def check_entries(root, entries):
+    # Returns (missing, corrupt) keys. A size mismatch is reported without
+    # reading the file; everything else is re-hashed in parallel.
+    missing = []
+    corrupt = []
+    to_hash = {}
+    for key, entry in entries.items():
+        path = os.path.join(root, key)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            missing.append(key)
+            continue
+        if size != entry.get("size"):
+            corrupt.append(key)
+        else:
+            to_hash[path] = key
+    for path, result in hash_paths(list(to_hash)).items():
+        key = to_hash[path]
+        if result is None:
+            missing.append(key)
+        elif result[1] != entries[key].get("sha1"):
+            corrupt.append(key)
+    return missing, corrupt
+
+
+def print_problems(label, paths):
+    if not paths:
+        return
+    print(f"{label} ({len(paths)}):")
+    for path in sorted(paths)[:REPORT_LIMIT]:
+        print(f"  {path}")
+    if len(paths) > REPORT_LIMIT:
+        print(f"  ... and {len(paths) - REPORT_LIMIT} more")
+
+
+def verify_run_manifests(manifest_paths):
+    # Checks notes and images against one or more run manifests (one per
+    # shard, for example). Returns the number of problems found.
+    started = time.perf_counter()
+    missing = []
+    corrupt = []
+    stale = []
+    untracked = []
+    note_count = 0
+    image_count = 0
+    # {(root, extension): keys tracked by any manifest}; shards each track a
+    # part of the same folders.
+    tracked = {}
+    for manifest_path in manifest_paths:
+        manifest = load_run_manifest(manifest_path)
+        if manifest is None:
+            print(f"No usable run manifest at {manifest_path}.")
+            missing.append(manifest_path)
+            continue
+        for root, entries, extension in (
+            (manifest["notes_root"], manifest.get("notes") or {}, ".md"),
+            (manifest["images_root"], manifest.get("images") or {}, None),
+        ):
+            entry_missing, entry_corrupt = check_entries(root, entries)
+            missing.extend(os.path.join(root, key) for key in entry_missing)
+            corrupt.extend(os.path.join(root, key) for key in entry_corrupt)
+            tracked.setdefault((root, extension), set()).update(entries)
+        for key, entry in (manifest.get("notes") or {}).items():
+            source = entry.get("source")
+            if source and file_fingerprint(source) != entry.get("source_fingerprint"):
+                stale.append(os.path.join(manifest["notes_root"], key))
+        note_count += len(manifest.get("notes") or {})
+        image_count += len(manifest.get("images") or {})
+    for (root, extension), keys in tracked.items():
+        if os.path.isdir(root):
+            untracked.extend(path for path, key in walk_files(root, extension) if key not in keys)
+
+    print(
+        f"Verified {note_count} notes and {image_count} images in {time.perf_counter() - started:.2f}s: "
+        f"{len(missing)} missing, {len(corrupt)} corrupt, {len(stale)} stale, {len(untracked)} untracked"
+    )
+    print_problems("Missing", missing)
+    print_problems("Corrupt (size or hash differs)", corrupt)
+    print_problems("Stale (export file changed since the note was written)", stale)
+    print_problems("Untracked (not written by a recorded run)", untracked)
+    return len(missing) + len(corrupt) + len(stale)
@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import zlib
+
+from . import config
+
+
+WRITE_BATCH_SIZE = 16
+
+_STOP = object()
+
+
+class NoteChunks(list):
+    # A rendered note kept as the chunks it was produced in. Renderers write to
+    # it like a file; writers and the render pool pass it on as is, so a large
+    # note is never joined into one extra string on its way to disk.
+    def write(self, text):
+        if text:
+            self.append(text)
+
+    def getvalue(self):
+        return "".join(self)
+
+
+class NoteWriter:
+    # Rendered notes go into bounded queues drained by writer threads; a full
+    # queue blocks submit() so rendering can never run far ahead of the disk.
+    # Each thread has its own queue and a path always goes to the same one, so
+    # two versions of one note are written in the order they were submitted.
+    def __init__(self, workers=None, queue_size=None, track_written=False):
+        self.workers = max(1, workers or config.write_workers)
+        self.track_written = track_written
+        queue_size = max(1, (queue_size or config.write_queue_size) // self.workers)
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(self.workers)]
+        self._created_directories = set()
+        self._directory_lock = threading.Lock()
+        self._errors = []
+        # With track_written: {key: None while queued, True once written, False
+        # if the write failed} for notes submitted with a key, so the caller can
+        # tell which are on disk.
+        self._outcomes = {}
+        self._outcome_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._drain, args=(note_queue,), name=f"wa-writer-{number}", daemon=True)
+            for number, note_queue in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, path, text, key=None):
+        if not self.track_written:
+            key = None
+        if key is not None:
+            with self._outcome_lock:
+                self._outcomes[key] = None
+        self._queue_for(path).put((path, text, key))
+
+    def _queue_for(self, path):
+        if len(self._queues) == 1:
+            return self._queues[0]
+        return self._queues[zlib.crc32(os.fsencode(path)) % len(self._queues)]
+
+    def tracks(self, key):
+        with self._outcome_lock:
+            return key in self._outcomes
+
+    def take_written(self):
+        # Keys of the notes written since the last call.
+        with self._outcome_lock:
+            written = [key for key, outcome in self._outcomes.items() if outcome]
+            for key in written:
+                del self._outcomes[key]
+        return written
+
+    def pending(self):
+        return sum(note_queue.qsize() for note_queue in self._queues)
+
+    def flush(self):
+        for note_queue in self._queues:
+            note_queue.join()
+
+    def close(self):
+        for note_queue in self._queues:
+            note_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        for path, error in self._errors:
+            print(f"Failed to write note {path}. Error: {error}")
+        return self._errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def ensure_directories(self, directories):
+        with self._directory_lock:
+            missing = [directory for directory in directories if directory not in self._created_directories]
+            for directory in sorted(missing):
+                os.makedirs(directory, exist_ok=True)
+                self._created_directories.add(directory)
+
+    def _next_batch(self, note_queue):
+        batch = [note_queue.get()]
+        while len(batch) < WRITE_BATCH_SIZE and batch[-1] is not _STOP:
+            try:
+                batch.append(note_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, note_queue):
+        while True:
+            batch = self._next_batch(note_queue)
+            notes = [item for item in batch if item is not _STOP]
+            if notes:
+                self._write_batch(notes)
+            for _ in batch:
+                note_queue.task_done()
+            if len(notes) != len(batch):
+                return
+
+    def _write_batch(self, notes):
+        directories = {os.path.dirname(path) for path, _, _ in notes}
+        try:
+            self.ensure_directories(directories - {""})
+        except OSError as exc:
+            self._errors.extend((path, exc) for path, _, _ in notes)
+            self._record_outcomes([key for _, _, key in notes], False)
+            return
+        for path, text, key in notes:
+            try:
+                self.write_note(path, text)
+            except OSError as exc:
+                self._errors.append((path, exc))
+                self._record_outcomes([key], False)
+            else:
+                self._record_outcomes([key], True)
+
+    def _record_outcomes(self, keys, written):
+        with self._outcome_lock:
+            for key in keys:
+                if key is not None:
+                    self._outcomes[key] = written
+
+    def write_note(self, path, text):
+        write_note_file(path, text)
+
+
+def note_text(text):
+    return text if isinstance(text, str) else "".join(text)
+
+
+def write_note_file(path, text):
+    with open(path, "w", encoding="utf-8") as markdown_file:
+        if isinstance(text, str):
+            markdown_file.write(text)
+        else:
+            markdown_file.writelines(text)